@@ -1,12 +1,20 @@
+import atexit
 import json
 import logging
+import multiprocessing
 import os
 import sched
+import socket
 import time
 from config import Config
+from diagnostics import Diagnostics
 from dotenv import load_dotenv
 from functions import fetch
+from history import HistoryIndex
 from logger import Logger
+from mirrors import Mirrors
+from shard import Shard
+from tenants import Tenants
 from watcher import Watcher
 from webhooker import Webhooker
 
@@ -14,40 +22,142 @@ load_dotenv()
 log = logging.getLogger("main")
 
 
-def main() -> None:
-    logging.basicConfig(
-        format="%(asctime)s %(levelname)-8s %(message)s",
-        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
-    Logger.debug(f"Environment: {os.environ.get('ENV', 'PRODUCTION').upper()}")
-    Logger.log("~~~ Nyaa Watcher ~~~")
+def load_watcher() -> tuple[Watcher, Webhooker, int]:
+    """
+    Loads the JSON files of the `/watcher` directory and creates its watcher.
+    :return: A tuple of the Watcher object, the Webhooker object and the interval (in seconds) between checks.
+    """
 
-    if not os.path.exists(os.environ.get("DOWNLOADS_DIR", "/downloads")):
-        Logger.log("Map a local directory to the '/downloads' container directory to access downloaded files.", {"tip": True})
+    interval = Config.get_interval()
+    subscriptions = Config.get_subscriptions()
+    history = Config.get_history()
+    webhooks = Config.get_webhooks()
 
-    try:
-        Config.update_and_verify()
+    if HistoryIndex.is_enabled():
+        try:
+            HistoryIndex.sync(history)
+        except Exception as e:
+            Logger.log("History Index Error: Cannot build the history index.")
+            Logger.debug(f"{e}", {"exc_info": True})
+
+    Logger.debug(
+        f"INTERVAL: {interval} seconds.\n"
+        f"SUBSCRIPTIONS: {len(subscriptions.get('subscriptions'))} entries.\n"
+        f"HISTORY: {len(history.get('downloads'))} download(s) and {len(history.get('errors'))} error(s).\n"
+        f"WEBHOOKS: {len(webhooks.get('webhooks'))} entries."
+    )
+    return Watcher(subscriptions, history), Webhooker(webhooks), interval
 
-        interval = Config.get_interval()
-        subscriptions = Config.get_subscriptions()
-        history = Config.get_history()
-        webhooks = Config.get_webhooks()
 
-        watcher = Watcher(subscriptions, history)
-        webhooker = Webhooker(webhooks)
+def run(worker_id: str = None) -> None:
+    """
+    Loads the JSON files and runs the watcher until it is interrupted.
+    :param worker_id: The unique ID of the shard worker, when subscriptions are sharded (Defaults to `None`).
+    :return: None
+    """
 
-        Logger.debug(
-            f"INTERVAL: {interval} seconds.\n"
-            f"SUBSCRIPTIONS: {len(subscriptions.get('subscriptions'))} entries.\n"
-            f"HISTORY: {len(history.get('downloads'))} download(s) and {len(history.get('errors'))} error(s).\n"
-            f"WEBHOOKS: {len(webhooks.get('webhooks'))} entries."
-        )
+    if Shard.is_enabled():
+        Shard.start(worker_id)
+    Mirrors.start()
+    Diagnostics.start()
+
+    try:
+        watcher, webhooker, interval = load_watcher()
         Logger.log(f"Done! Watcher started (v{Config.version}).")
 
         scheduler = sched.scheduler(time.time, time.sleep)
         scheduler.enter(1, 1, fetch, (scheduler, watcher, interval, webhooker))
         scheduler.run()
+    finally:
+        Mirrors.stop()
+        if Shard.is_enabled():
+            Shard.stop()
+
+
+def run_tenants() -> None:
+    """
+    Loads the JSON files of every `TENANT_DIRS` directory and runs their watchers in one process until it is interrupted.
+    :return: None
+    """
+
+    Mirrors.start()
+    Diagnostics.start()
+    try:
+        scheduler = sched.scheduler(time.time, time.sleep)
+        for tenant in Tenants.get_tenants():
+            Logger.log(f"Loading tenant '{tenant.name}' ({tenant.watcher_dir})...")
+            Tenants.activate(tenant)
+            Config.update_and_verify()
+
+            watcher, webhooker, interval = load_watcher()
+            scheduler.enter(1, 1, fetch, (scheduler, watcher, interval, webhooker, tenant))
+
+        tenants = Tenants.get_tenants()
+        Logger.log(f"Done! Watcher started for {len(tenants)} tenant{'' if len(tenants) == 1 else 's'} (v{Config.version}).")
+        scheduler.run()
+    finally:
+        Mirrors.stop()
+
+
+def run_worker(worker_id: str) -> None:
+    """
+    Runs the watcher as one of the `WORKERS` processes.
+    :param worker_id: The unique ID of the shard worker.
+    :return: None
+    """
+
+    Logger.setup()  # The background logging thread of `LOG_QUEUE` does not exist in forked processes
+    try:
+        # Spawned processes do not inherit the verified state of the parent process, so the files are verified again (They are already updated)
+        Config.update_and_verify()
+        run(worker_id)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        Logger.log(f"Worker '{worker_id}' Error: {e}\nWorker exited.", {"white_lines": "b"})
+        Logger.debug(f"{e}", {"exc_info": True})
+    finally:
+        Logger.stop()
+
+
+def main() -> None:
+    Logger.setup()
+    atexit.register(Logger.stop)
+    Logger.debug(f"Environment: {os.environ.get('ENV', 'PRODUCTION').upper()}")
+    Logger.log("~~~ Nyaa Watcher ~~~")
+
+    if not os.path.exists(os.environ.get("DOWNLOADS_DIR", "/downloads")):
+        Logger.log("Map a local directory to the '/downloads' container directory to access downloaded files.", {"tip": True})
+
+    try:
+        if Tenants.is_enabled():
+            if int(os.environ.get("WORKERS", 1)) > 1 or Shard.is_enabled():
+                Logger.log("'WORKERS' and 'SHARDING' are not used with 'TENANT_DIRS'. Running every tenant in one process.", {"tip": True})
+                os.environ["WORKERS"] = "1"
+                os.environ["SHARDING"] = "false"
+            run_tenants()
+        else:
+            Config.update_and_verify()
+
+            workers = int(os.environ.get("WORKERS", 1))
+            if workers > 1:
+                worker_prefix = os.environ.get("WORKER_ID") or socket.gethostname()
+                processes = [multiprocessing.Process(target=run_worker, args=(f"{worker_prefix}-{i + 1}",), name=f"worker-{i + 1}") for i in range(workers)]
+                for process in processes:
+                    process.start()
+                try:
+                    for process in processes:
+                        process.join()
+                except KeyboardInterrupt:
+                    # The workers receive the interrupt too, and are stopped if they do not exit in time
+                    for process in processes:
+                        process.join(5)
+                        if process.is_alive():
+                            process.terminate()
+                            process.join()
+                    raise
+            else:
+                run()
 
     except KeyboardInterrupt:
         Logger.log("Watcher exited.", {"white_lines": "bt"})
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from config import Config
+from logger import Logger
+
+
+class _Circuit:
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened = 0
+        self.retry_at = 0.0
+
+
+class Breaker:
+    """
+    Per-subscription circuit breaker for feeds that keep failing.
+    After `BREAKER_THRESHOLD` failed fetches in a row, a subscription is skipped (open) for an exponentially increasing backoff.
+    When the backoff ends, a single fetch is allowed as a probe (half-open): a success closes the circuit, and a failure opens it again for twice as long.
+    Circuits are kept per `scope`, which is the active tenant in multi-tenant mode, so tenants with the same subscription name do not share a circuit.
+    """
+
+    circuits: dict[tuple[str, str], _Circuit] = {}
+    lock = threading.Lock()
+    scope = ""
+
+    @staticmethod
+    def get_threshold() -> int:
+        """
+        Gets the `BREAKER_THRESHOLD` environment variable.
+        :return: The number of failed fetches in a row that opens a subscription's circuit (Defaults to `3`). `0` disables the circuit breaker.
+        """
+
+        return max(0, int(os.environ.get("BREAKER_THRESHOLD", 3)))
+
+    @staticmethod
+    def get_backoff(opened: int) -> float:
+        """
+        Gets the backoff of an open circuit, from the `BREAKER_BACKOFF_SEC` and `BREAKER_MAX_BACKOFF_SEC` environment variables.
+        :param opened: The number of times the circuit has opened in a row.
+        :return: The number of seconds to skip the subscription (Defaults to `300` seconds, doubled each time, up to `21600` seconds).
+        """
+
+        backoff = float(os.environ.get("BREAKER_BACKOFF_SEC", 300))
+        max_backoff = float(os.environ.get("BREAKER_MAX_BACKOFF_SEC", 21600))
+        return min(max_backoff, backoff * 2 ** max(0, opened - 1))
+
+    @staticmethod
+    def allow(sub_name: str) -> bool:
+        """
+        Checks if a subscription's feed can be fetched.
+        :param sub_name: The `username` property from a `subscriptions` entry.
+        :return: `True` if the circuit is closed, or if it is half-open and the fetch is a probe. `False` if the subscription is skipped.
+        """
+
+        if Breaker.get_threshold() == 0:
+            return True
+
+        with Breaker.lock:
+            circuit = Breaker.circuits.get((Breaker.scope, sub_name))
+            if circuit is None or circuit.failures < Breaker.get_threshold():
+                return True
+            failures = circuit.failures
+            remaining = circuit.retry_at - time.time()
+
+        # Logging can wait for slow output, so it is done after releasing the lock
+        if remaining > 0:
+            Logger.log(f"Circuit Breaker: Skipping '{sub_name}' after {failures} failed searches. Retrying in {Config.get_interval_string(int(remaining) + 1)}.")
+            return False
+
+        Logger.log(f"Circuit Breaker: Probing '{sub_name}' after {failures} failed searches...")
+        return True
+
+    @staticmethod
+    def succeeded(sub_name: str) -> None:
+        """
+        Closes a subscription's circuit after a successful fetch.
+        :param sub_name: The `username` property from a `subscriptions` entry.
+        :return: None
+        """
+
+        with Breaker.lock:
+            circuit = Breaker.circuits.pop((Breaker.scope, sub_name), None)
+        if circuit is not None and circuit.failures >= Breaker.get_threshold() > 0:
+            Logger.log(f"Circuit Breaker: '{sub_name}' recovered after {circuit.failures} failed searches.")
+
+    @staticmethod
+    def failed(sub_name: str) -> None:
+        """
+        Records a failed fetch of a subscription's feed, opening its circuit when the threshold is reached.
+        :param sub_name: The `username` property from a `subscriptions` entry.
+        :return: None
+        """
+
+        threshold = Breaker.get_threshold()
+        if threshold == 0:
+            return
+
+        with Breaker.lock:
+            circuit = Breaker.circuits.setdefault((Breaker.scope, sub_name), _Circuit())
+            circuit.failures += 1
+            if circuit.failures < threshold:
+                return
+
+            circuit.opened += 1
+            backoff = Breaker.get_backoff(circuit.opened)
+            circuit.retry_at = time.time() + backoff
+            failures = circuit.failures
+        Logger.log(f"Circuit Breaker: '{sub_name}' failed {failures} searches in a row. Skipping it for {Config.get_interval_string(int(backoff))}.")
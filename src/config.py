@@ -1,8 +1,68 @@
 import json
 import os
+import re
+from contextlib import contextmanager
+from history import HistoryIndex
+from linter import lint_pattern
 from logger import Logger
 from updates import get_json_path, update_files
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def _lock_json(filename: str):
+    """
+    Holds an exclusive lock on a JSON file while it is read and rewritten, so shard workers sharing the directory do not overwrite each other's changes.
+    :param filename: The name of the JSON file (without the file extension).
+    :return: A context manager that releases the lock on exit.
+    """
+
+    if fcntl is None:
+        yield
+        return
+
+    file = open(get_json_path(filename) + ".lock", "a")
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(file, fcntl.LOCK_UN)
+        file.close()
+
+
+def _write_json(filename: str, data: dict) -> None:
+    """
+    Writes a JSON file atomically, so readers never see a partially written file.
+    :param filename: The name of the JSON file (without the file extension).
+    :param data: The dictionary to write.
+    :return: None
+    """
+
+    path = get_json_path(filename)
+    file = open(path + ".tmp", "w")
+    file.write(json.dumps(data, indent=4))
+    file.close()
+    os.replace(path + ".tmp", path)
+
+
+def _set_waiting(sub: dict, waiting: dict) -> None:
+    """
+    Sets the properties of the torrents that are waiting to be downloaded in a subscription entry. Empty properties are removed.
+    :param sub: A `subscriptions` entry.
+    :param waiting: A dictionary of the waiting properties (`pending` and `deferred`) and their entries.
+    :return: None
+    """
+
+    for key, entries in waiting.items():
+        if entries:
+            sub[key] = entries
+        else:
+            sub.pop(key, None)
+
 
 def _generate_files() -> None:
     """
@@ -205,6 +265,10 @@ def _verify_subscriptions_parse() -> None:
             raise Exception(f"Subscriptions Parse Error: The '{sub.get('username', 'Unknown User')}' subscription has {result.get('message')}. Change the properties in 'subscriptions.json' and restart the watcher.")
 
 
+def _is_priority(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
 def _verify_subscriptions_entry(sub: dict) -> dict:
     """
     Verifies a subscription entry in the 'subscriptions.json' file.
@@ -230,14 +294,45 @@ def _verify_subscriptions_entry(sub: dict) -> dict:
             "message": "one or more entries requires an 'rss' value"
         }
 
+    if not _is_priority(sub.get('priority', 0)):
+        return {
+            "result": False,
+            "message": "an invalid 'priority' value (must be an integer)"
+        }
+
     if sub.get('watchlist'):
         for watchlist in sub.get('watchlist'):
+            if not _is_priority(watchlist.get('priority', 0)):
+                return {
+                    "result": False,
+                    "message": "an invalid watchlist 'priority' value (must be an integer)"
+                }
+
             if len(watchlist.get('tags', []) + watchlist.get('regex', [])) == 0:
                 return {
                     "result": False,
                     "message": "empty 'tags' and/or 'regex' values."
                 }
 
+            dedupe = watchlist.get('dedupe')
+            if dedupe is not None and (not isinstance(dedupe, dict) or dedupe.get('policy', "first") not in ("first", "version", "resolution")):
+                return {
+                    "result": False,
+                    "message": "an invalid 'dedupe' value ('policy' must be 'first', 'version' or 'resolution')"
+                }
+
+            for pattern in watchlist.get('regex', []) + watchlist.get('exclude_regex', []):
+                try:
+                    warnings = lint_pattern(pattern)
+                except re.error as e:
+                    return {
+                        "result": False,
+                        "message": f"an invalid regular expression pattern '{pattern}' ({e})"
+                    }
+                for warning in warnings:
+                    Logger.log(f"Regex Warning: The '{pattern}' pattern in the '{watchlist.get('name') or 'Unknown Watchlist'}' watchlist of the '{sub.get('username')}' subscription "
+                               f"contains {warning}, which can make matching slow.")
+
     return {"result": True, "message": "success"}
 
 
@@ -378,36 +473,42 @@ class Config:
     def append_to_history(successes: list, errors: list) -> None:
         """
         Appends download and error entries to the 'history.json' file.
-        :param successes: A list of dictionaries for successful torrent downloads.
-        :param errors: A list of dictionaries for unsuccessful torrent downloads.
+        :param successes: A list of `Torrent` objects for successful torrent downloads.
+        :param errors: A list of `Torrent` objects for unsuccessful torrent downloads.
         :return: None
         """
 
-        file = open(get_json_path("history"), "r")
-        history = json.loads(file.read())
-        file.close()
+        with _lock_json("history"):
+            file = open(get_json_path("history"), "r")
+            history = json.loads(file.read())
+            file.close()
 
-        for success in successes:
-            history.get('downloads').append({
-                "uploader": success.get('uploader'),
-                "torrent_title": success.get('title'),
-                "date_downloaded": success.get('download_datetime'),
-                "nyaa_page": success.get('id'),
-                "nyaa_hash": success.get('nyaa_infohash')
-            })
-
-        for error in errors:
-            history.get('errors').append({
-                "uploader": error.get('uploader'),
-                "torrent_title": error.get('title'),
-                "date_failed": error.get('download_datetime'),
-                "nyaa_page": error.get('id'),
-                "nyaa_hash": error.get('nyaa_infohash')
-            })
-
-        file = open(get_json_path("history"), "w")
-        file.write(json.dumps(history, indent=4))
-        file.close()
+            downloads = [{
+                "uploader": success.uploader,
+                "torrent_title": success.title,
+                "date_downloaded": success.download_datetime,
+                "nyaa_page": success.id,
+                "nyaa_hash": success.nyaa_infohash
+            } for success in successes]
+
+            failures = [{
+                "uploader": error.uploader,
+                "torrent_title": error.title,
+                "date_failed": error.download_datetime,
+                "nyaa_page": error.id,
+                "nyaa_hash": error.nyaa_infohash
+            } for error in errors]
+
+            history.get('downloads').extend(downloads)
+            history.get('errors').extend(failures)
+            _write_json("history", history)
+
+            if HistoryIndex.is_enabled():
+                try:
+                    HistoryIndex.add(downloads, failures)
+                except Exception as e:
+                    Logger.log("History Index Error: Cannot update the history index. It will be rebuilt when the watcher restarts.")
+                    Logger.debug(f"{e}", {"exc_info": True})
         Logger.debug(f"Appended {len(successes)} download{'' if len(successes) == 1 else 's'} and {len(errors)} error{'' if len(errors) == 1 else 's'} to 'history.json'.")
 
     @staticmethod
@@ -485,23 +586,51 @@ class Config:
         return webhooks
 
     @staticmethod
-    def set_previous_hash(sub_name: str, hash_value: str) -> None:
+    def set_cursor(sub_name: str, hash_value: str, published: int | None = None, recent_hashes: list[str] = None, pending: list[dict] = None) -> None:
         """
-        Sets the previous hash value for a subscription in the 'subscriptions.json'.
+        Sets the cursor of a subscription in the 'subscriptions.json': the previous hash value, the publish time watermark and the recent hashes.
+        The torrents waiting for a preferred resolution are written with the cursor, since the cursor moves past them.
         :param sub_name: The name of the subscription.
         :param hash_value: The hash value to set.
+        :param published: The newest publish time (as a Unix timestamp) of the fetch (Defaults to `None`).
+        :param recent_hashes: The most recent torrent hashes (Defaults to `None`).
+        :param pending: The `pending` entries of the subscription (Defaults to `None`).
         :return: None
         """
 
-        file = open(get_json_path("subscriptions"), "r")
-        subscriptions = json.loads(file.read())
-        file.close()
+        with _lock_json("subscriptions"):
+            file = open(get_json_path("subscriptions"), "r")
+            subscriptions = json.loads(file.read())
+            file.close()
 
-        for sub in subscriptions.get('subscriptions'):
-            if sub.get('username') == sub_name:
-                sub['previous_hash'] = hash_value or sub['previous_hash']
-                break
+            for sub in subscriptions.get('subscriptions'):
+                if sub.get('username') == sub_name:
+                    sub['previous_hash'] = hash_value or sub['previous_hash']
+                    if published is not None:
+                        sub['previous_published'] = max(published, sub.get('previous_published') or 0)
+                    if recent_hashes is not None:
+                        sub['recent_hashes'] = recent_hashes
+                    if pending is not None:
+                        _set_waiting(sub, {"pending": pending})
+                    break
 
-        file = open(get_json_path("subscriptions"), "w")
-        file.write(json.dumps(subscriptions, indent=4))
-        file.close()
+            _write_json("subscriptions", subscriptions)
+
+    @staticmethod
+    def set_waiting(waiting: dict[str, dict]) -> None:
+        """
+        Sets the torrents that are waiting to be downloaded in the 'subscriptions.json', so they are downloaded after a restart.
+        :param waiting: A dictionary of subscription names and dictionaries of their `pending` and `deferred` entries. Other subscriptions are not changed.
+        :return: None
+        """
+
+        with _lock_json("subscriptions"):
+            file = open(get_json_path("subscriptions"), "r")
+            subscriptions = json.loads(file.read())
+            file.close()
+
+            for sub in subscriptions.get('subscriptions'):
+                if sub.get('username') in waiting:
+                    _set_waiting(sub, waiting.get(sub.get('username')))
+
+            _write_json("subscriptions", subscriptions)
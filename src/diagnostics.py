@@ -0,0 +1,147 @@
+import glob
+import os
+import time
+import tracemalloc
+from logger import Logger
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+]
+
+
+def _format_size(size: float, sign: bool = False) -> str:
+    prefix = "+" if sign and size >= 0 else ""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{prefix}{size:.1f} {unit}" if unit != "B" else f"{prefix}{size:.0f} {unit}"
+        size /= 1024
+    return f"{prefix}{size:.1f} GiB"
+
+
+class Diagnostics:
+    """
+    Opt-in memory growth diagnostics for long-running watchers.
+    Allocations are traced with `tracemalloc`, and every `MEMORY_DIAGNOSTICS_CYCLES` checks a snapshot is compared with the previous one
+    to log the source lines with the largest growth. Only the previous snapshot is kept in memory.
+    """
+
+    cycles = 0
+    previous: tracemalloc.Snapshot | None = None
+
+    @staticmethod
+    def get_interval() -> int:
+        """
+        Gets the `MEMORY_DIAGNOSTICS_CYCLES` environment variable.
+        :return: The number of checks between snapshots (Defaults to `0`). `0` disables the diagnostics.
+        """
+
+        return max(0, int(os.environ.get("MEMORY_DIAGNOSTICS_CYCLES", 0)))
+
+    @staticmethod
+    def get_top() -> int:
+        """
+        Gets the `MEMORY_DIAGNOSTICS_TOP` environment variable.
+        :return: The number of source lines logged after each snapshot (Defaults to `10`).
+        """
+
+        return max(1, int(os.environ.get("MEMORY_DIAGNOSTICS_TOP", 10)))
+
+    @staticmethod
+    def get_frames() -> int:
+        """
+        Gets the `MEMORY_DIAGNOSTICS_FRAMES` environment variable.
+        :return: The number of stack frames stored for each allocation (Defaults to `1`). More frames show the callers of an allocation, but use more memory and time.
+        """
+
+        return max(1, int(os.environ.get("MEMORY_DIAGNOSTICS_FRAMES", 1)))
+
+    @staticmethod
+    def get_snapshot_dir() -> str | None:
+        """
+        Gets the `MEMORY_SNAPSHOT_DIR` environment variable.
+        :return: The directory where snapshots are written for offline comparison (Defaults to `None`).
+        """
+
+        return os.environ.get("MEMORY_SNAPSHOT_DIR") or None
+
+    @staticmethod
+    def get_snapshot_limit() -> int:
+        """
+        Gets the `MEMORY_SNAPSHOT_LIMIT` environment variable.
+        :return: The number of snapshot files kept in `MEMORY_SNAPSHOT_DIR`. Older files are deleted (Defaults to `10`).
+        """
+
+        return max(1, int(os.environ.get("MEMORY_SNAPSHOT_LIMIT", 10)))
+
+    @staticmethod
+    def start() -> None:
+        """
+        Starts tracing allocations if the diagnostics are enabled.
+        :return: None
+        """
+
+        if Diagnostics.get_interval() == 0 or tracemalloc.is_tracing():
+            return
+
+        tracemalloc.start(Diagnostics.get_frames())
+        Logger.log(f"Memory Diagnostics: Tracing allocations. Comparing snapshots every {Diagnostics.get_interval()} searches.")
+
+    @staticmethod
+    def cycle() -> None:
+        """
+        Counts a finished check, and takes and compares a snapshot every `MEMORY_DIAGNOSTICS_CYCLES` checks.
+        :return: None
+        """
+
+        if not tracemalloc.is_tracing():
+            return
+
+        Diagnostics.cycles += 1
+        if Diagnostics.cycles % Diagnostics.get_interval() != 0:
+            return
+
+        try:
+            Diagnostics.snapshot()
+        except Exception as e:
+            Logger.log("Memory Diagnostics Error: Cannot take a snapshot.")
+            Logger.debug(f"{e}", {"exc_info": True})
+
+    @staticmethod
+    def snapshot() -> None:
+        """
+        Takes a snapshot, logs the largest growth since the previous snapshot and writes it to `MEMORY_SNAPSHOT_DIR`.
+        :return: None
+        """
+
+        started = time.monotonic()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        messages = [f"Memory Diagnostics: {_format_size(current)} traced ({_format_size(peak)} peak) after {Diagnostics.cycles} searches."]
+        if Diagnostics.previous is not None:
+            stats = snapshot.compare_to(Diagnostics.previous, "lineno")
+            growth = sum(stat.size_diff for stat in stats)
+            messages.append(f" - {_format_size(growth, True)} since the previous snapshot. Largest changes:")
+            for stat in stats[:Diagnostics.get_top()]:
+                frame = stat.traceback[0]
+                messages.append(f"   {_format_size(stat.size_diff, True):>11} ({stat.count_diff:+} blocks, {_format_size(stat.size)} total) "
+                                f"{frame.filename}:{frame.lineno}")
+        Diagnostics.previous = snapshot
+
+        directory = Diagnostics.get_snapshot_dir()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"snapshot-{os.getpid()}-{Diagnostics.cycles:06d}.tracemalloc")
+            snapshot.dump(path)
+            messages.append(f" - Snapshot written to '{path}'.")
+
+            files = sorted(glob.glob(os.path.join(directory, f"snapshot-{os.getpid()}-*.tracemalloc")))
+            for file in files[:-Diagnostics.get_snapshot_limit()]:
+                os.remove(file)
+
+        messages.append(f" - Snapshot took {time.monotonic() - started:.2f} seconds.")
+        Logger.log(messages)
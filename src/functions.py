@@ -1,91 +1,410 @@
+import itertools
 import os
-import requests
 import sched
 import re
+import threading
 import time
 from config import Config
+from queue import Empty, PriorityQueue
+from urllib.parse import quote
 from datetime import datetime
+from diagnostics import Diagnostics
 from logger import Logger
-from watcher import Watcher
+from requester import Requester
+from rpc import add_to_client
+from store import TorrentStore
+from tenants import Tenant, Tenants
+from torrent import Torrent
+from watcher import Watcher, get_priority_key
 from webhooker import Webhooker
 
 
-def download_torrent(title: str, url: str) -> dict:
+def download_torrent(title: str, url: str, infohash: str = None) -> dict:
     """
     Downloads a torrent file from a given URL.
+    If the torrent is already in the torrent store, the file is linked from the store instead of being downloaded.
     :param title: The title of the torrent for the filename.
     :param url: The URL where the torrent file can be downloaded.
-    :return: A dictionary containing the status of the download. If successful, the dictionary's `status` value code will be `200`.
+    :param infohash: The Nyaa infohash of the torrent, used as the torrent store key (Defaults to `None`).
+    :return: A dictionary containing the status of the download. If successful, the dictionary's `status` value code will be `200`
+        and the `stored` value will be `True` when the file was linked from the torrent store.
         If an error occurs, the dictionary's `status` value will contain the status code and the `message` value will contain an error message.
     """
 
     file_path = os.environ.get("DOWNLOADS_DIR", "/downloads") + f"/{title}.torrent"
     try:
-        response = requests.get(url)
+        stored_path = TorrentStore.get(infohash)
+        if stored_path:
+            TorrentStore.link(stored_path, file_path)
+            return {"status": 200, "message": "success", "stored": True}
+
+        response = Requester.get(url)
         if response.status_code == 200:
-            with open(file_path, "wb") as f:
-                f.write(response.content)
+            stored_path = TorrentStore.add(infohash, response.content)
+            if stored_path:
+                TorrentStore.link(stored_path, file_path)
+            else:
+                with open(file_path, "wb") as f:
+                    f.write(response.content)
             time.sleep(0.01)  # Wait for file
-        return {"status": response.status_code, "message": "success" if response.status_code == 200 else "Error occurred while downloading."}
+        return {"status": response.status_code, "message": "success" if response.status_code == 200 else "Error occurred while downloading.", "stored": False}
     except Exception as e:
         return {"status": 500, "message": str(e)}
 
 
-def fetch(scheduler: sched, watcher: Watcher, interval: int, webhooker: Webhooker) -> None:
+def get_output_mode() -> str:
     """
-    Fetches all new torrents and schedules the next check.
-    :param scheduler: The scheduler object used to schedule the next check.
-    :param watcher: The Watcher object used to fetch all new torrents.
+    Gets the `OUTPUT_MODE` environment variable.
+    :return: `torrent` to download torrent files, `magnet` to save magnet links,
+        or `qbittorrent`/`transmission` to add torrents to a torrent client (Defaults to `torrent`).
+    """
+
+    mode = os.environ.get("OUTPUT_MODE", "torrent").lower()
+    if mode not in ("torrent", "magnet", "qbittorrent", "transmission"):
+        Logger.log(f"Unknown 'OUTPUT_MODE' value '{mode}'. Downloading torrent files instead.", {"tip": True})
+        return "torrent"
+    return mode
+
+
+def get_trackers() -> list[str]:
+    """
+    Gets the `MAGNET_TRACKERS` environment variable.
+    :return: A list of tracker URLs added to magnet links (Defaults to the trackers used by Nyaa).
+    """
+
+    trackers = os.environ.get("MAGNET_TRACKERS")
+    if trackers is None:
+        return [
+            "http://nyaa.tracker.wf:7777/announce",
+            "udp://open.stealth.si:80/announce",
+            "udp://tracker.opentrackr.org:1337/announce",
+            "udp://exodus.desync.com:6969/announce",
+            "udp://tracker.torrent.eu.org:451/announce"
+        ]
+    return [tracker.strip() for tracker in trackers.split(",") if tracker.strip()]
+
+
+def create_magnet(infohash: str, title: str, trackers: list[str]) -> str:
+    """
+    Creates a magnet link from a torrent's infohash.
+    :param infohash: The Nyaa infohash of the torrent.
+    :param title: The title of the torrent, used as the display name.
+    :param trackers: A list of tracker URLs.
+    :return: A magnet URI string.
+    """
+
+    magnet = f"magnet:?xt=urn:btih:{infohash}&dn={quote(title)}"
+    for tracker in trackers:
+        magnet += f"&tr={quote(tracker, safe='')}"
+    return magnet
+
+
+def save_magnets(torrents: list[Torrent]) -> list[dict]:
+    """
+    Saves magnet links for a list of torrents, without downloading the torrent files.
+    Each magnet link is written to a `.magnet` file, or every magnet link is appended to the `MAGNET_LIST_FILE` file in a single write.
+    Torrents without an infohash are downloaded as torrent files instead.
+    :param torrents: A list of `Torrent` objects.
+    :return: A list of dictionaries containing the status of each torrent, in the same order as `torrents`.
+    """
+
+    downloads_dir = os.environ.get("DOWNLOADS_DIR", "/downloads")
+    list_file = os.environ.get("MAGNET_LIST_FILE")
+    trackers = get_trackers()
+
+    results = list()
+    magnets = list()
+    for torrent in torrents:
+        filename: str = truncate_title(torrent.title, torrent.uploader)
+        infohash: str = torrent.nyaa_infohash
+
+        if not infohash:
+            Logger.log(f" - Downloading: {torrent.title}...", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "download"}})
+            results.append(download_torrent(filename, torrent.link) | {"filename": f"{filename}.torrent"})
+            continue
+
+        magnet = create_magnet(infohash, torrent.title, trackers)
+        if list_file:
+            magnets.append(magnet)
+            results.append({"status": 200, "message": "success", "filename": os.path.basename(list_file)})
+            continue
+
+        Logger.log(f" - Saving magnet link: {torrent.title}...", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "download"}})
+        try:
+            with open(f"{downloads_dir}/{filename}.magnet", "w") as f:
+                f.write(magnet + "\n")
+            results.append({"status": 200, "message": "success", "filename": f"{filename}.magnet"})
+        except Exception as e:
+            results.append({"status": 500, "message": str(e)})
+
+    if magnets:
+        Logger.log(f" - Saving {len(magnets)} magnet link{'' if len(magnets) == 1 else 's'} to '{list_file}'...")
+        try:
+            with open(list_file, "a") as f:
+                f.write("\n".join(magnets) + "\n")
+        except Exception as e:
+            results = [{"status": 500, "message": str(e)} if result.get('filename') == os.path.basename(list_file) else result for result in results]
+    return results
+
+
+def save_torrents(torrents: list[Torrent]) -> list[dict]:
+    """
+    Saves a list of torrents with the `OUTPUT_MODE` output, or adds them to a torrent client.
+    :param torrents: A list of `Torrent` objects.
+    :return: A list of dictionaries containing the status of each torrent, in the same order as `torrents`.
+        Successful results contain the saved `filename` value, or the `client` value when added to a torrent client.
+    """
+
+    mode = get_output_mode()
+    if mode == "magnet":
+        return save_magnets(torrents)
+
+    if mode in ("qbittorrent", "transmission"):
+        trackers = get_trackers()
+        magnets = [create_magnet(torrent.nyaa_infohash, torrent.title, trackers) if torrent.nyaa_infohash else None for torrent in torrents]
+        return add_to_client(mode, torrents, magnets)
+
+    results = list()
+    for torrent in torrents:
+        Logger.log(f" - Downloading: {torrent.title}...", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "download"}})
+        filename: str = truncate_title(torrent.title, torrent.uploader)
+        results.append(download_torrent(filename, torrent.link, torrent.nyaa_infohash) | {"filename": f"{filename}.torrent"})
+    return results
+
+
+_sequence = itertools.count()  # Keeps the order of torrents with the same priority key, so torrents are never compared
+
+
+def _put(queue: PriorityQueue, torrent: Torrent | None, result: dict = None) -> None:
+    """
+    Puts a torrent into a pipeline queue in download order. `None` ends the stage after every torrent in the queue.
+    :param queue: The download or notify queue.
+    :param torrent: A `Torrent` object, or `None` to end the stage.
+    :param result: The result of saving the torrent, for the notify queue (Defaults to `None`).
+    :return: None
+    """
+
+    key = get_priority_key(torrent) if torrent is not None else (float("inf"), 0.0)
+    queue.put((key, next(_sequence), torrent, result))
+
+
+def get_queue_size() -> int:
+    """
+    Gets the `PIPELINE_QUEUE_SIZE` environment variable.
+    :return: The maximum number of torrents waiting between the fetch, download and notify stages (Defaults to `100`).
+    """
+
+    return max(1, int(os.environ.get("PIPELINE_QUEUE_SIZE", 100)))
+
+
+def get_cycle_deadline(interval: int) -> float | None:
+    """
+    Gets the deadline of a check from the `CYCLE_DEADLINE_RATIO` environment variable.
     :param interval: The interval (in seconds) at which to check for new torrents.
-    :param webhooker: The Webhooker object used to send Discord notifications.
+    :return: The number of seconds a check can take, as a ratio of the interval (Defaults to `0.8`). `None` if the ratio is `0`.
+    """
+
+    ratio = float(os.environ.get("CYCLE_DEADLINE_RATIO", 0.8))
+    return interval * ratio if ratio > 0 else None
+
+
+def _download_stage(download_queue: PriorityQueue, notify_queue: PriorityQueue) -> None:
+    """
+    Saves the torrents from the download queue until the end of the cycle.
+    Every torrent waiting in the queue is saved in one batch, highest priority first, so torrent client outputs can add them with a single request.
+    :param download_queue: The queue of `Torrent` objects from the fetch stage. `None` ends the stage.
+    :param notify_queue: The queue of `Torrent` objects and their results for the notify stage.
     :return: None
     """
 
-    new_torrents = watcher.fetch_all_feeds()
+    finished = False
+    try:
+        while not finished:
+            batch = [download_queue.get()[2]]
+            while batch[-1] is not None:
+                try:
+                    batch.append(download_queue.get_nowait()[2])
+                except Empty:
+                    break
 
-    # No new torrents
-    if len(new_torrents) == 0:
-        Logger.log("Found 0 new uploads.")
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
 
-    # New torrents
-    else:
-        Logger.log(f"Found {len(new_torrents)} new upload{'' if len(new_torrents) == 1 else 's'}. Downloading...")
+            if Requester.is_expired():
+                for torrent in batch:
+                    _put(notify_queue, torrent, {"status": 408, "message": "The deadline of the search has passed.", "deferred": True})
+                continue
+
+            try:
+                results = list(save_torrents(batch))
+            except Exception as e:
+                Logger.debug(f"{e}", {"exc_info": True})
+                results = [{"status": 500, "message": str(e)} for _ in batch]
 
-        successes = list()
-        errors = list()
-        for torrent in new_torrents:
-            Logger.log(f" - Downloading: {torrent.get('title')}...")
+            # A torrent without a result is an error, so it is not added to the history as downloaded
+            if len(results) != len(batch):
+                Logger.debug(f"The output returned {len(results)} results for {len(batch)} torrents.")
+                results = results[:len(batch)] + [{"status": 500, "message": "No result from the output."} for _ in range(len(batch) - len(results))]
 
-            filename: str = truncate_title(torrent.get('title'), torrent.get('uploader'))
+            for torrent, result in zip(batch, results):
+                torrent.download_datetime = str(datetime.now())  # Attach download datetime to torrent
+                _put(notify_queue, torrent, result)
+    finally:
+        # After an unexpected error, the remaining torrents are reported as errors so the fetch stage never waits on a full queue
+        while not finished:
+            torrent = download_queue.get()[2]
+            finished = torrent is None
+            if torrent is not None:
+                _put(notify_queue, torrent, {"status": 500, "message": "The download stage stopped before saving the torrent."})
+        _put(notify_queue, None)
+
+
+def _notify_stage(notify_queue: PriorityQueue, webhooker: Webhooker, downloaded: set[str], successes: list, errors: list, deferred: list) -> None:
+    """
+    Logs the result of each saved torrent and sends its Discord notifications until the end of the cycle, highest priority first.
+    :param notify_queue: The queue of `Torrent` objects and their results from the download stage. `None` ends the stage.
+    :param webhooker: The Webhooker object used to send Discord notifications.
+    :param downloaded: The Nyaa infohashes in the history of the watcher. Torrents linked from the torrent store are only logged as already downloaded
+        if they are in the history, since the store is shared by every tenant.
+    :param successes: The list to append successfully saved torrents to.
+    :param errors: The list to append unsuccessfully saved torrents to.
+    :param deferred: The list to append torrents that were not saved before the deadline to.
+    :return: None
+    """
 
-            download = download_torrent(filename, torrent.get('link'))
-            torrent['download_datetime'] = str(datetime.now())  # Attach download datetime to torrent
+    item = None
+    try:
+        while (item := notify_queue.get())[2] is not None:
+            _, _, torrent, result = item
+            if result.get('status') != 200 and (result.get('deferred') or Requester.is_expired()):
+                Logger.log(f" - Deferred to the next search: {torrent.title}", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}})
+                deferred.append(torrent)
 
-            if download.get('status') == 200:
-                Logger.log(f" - Downloaded! Saved as: '{filename}.torrent'")
+            elif result.get('status') == 200:
+                if result.get('client'):
+                    Logger.log(f" - Added to {result.get('client')}: {torrent.title}", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}})
+                elif result.get('stored') and torrent.nyaa_infohash in downloaded:
+                    Logger.log(f" - Already downloaded! Linked from the torrent store as: '{result.get('filename')}'", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}})
+                else:
+                    Logger.log(f" - Saved as: '{result.get('filename')}'", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}})
                 successes.append(torrent)
 
-                for webhook_name in torrent.get('webhooks'):
-                    webhooker.send_notification(webhook_name, torrent)
+                for webhook_name in torrent.webhooks:
+                    try:
+                        webhooker.send_notification(webhook_name, torrent)
+                    except Exception as e:
+                        Logger.log(f"Webhook Error: Failed to send notification via '{webhook_name}' discord webhook.", {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}})
+                        Logger.debug(f"{e}", {"exc_info": True})
 
             else:
                 Logger.log(
-                    f" - Error: {torrent.get('title')} (HTTP Status Code: {download.get('status')}.\n"
-                    f" - Error Message: {download.get('message', 'Unknown error.')}"
+                    f" - Error: {torrent.title} (HTTP Status Code: {result.get('status')}.\n"
+                    f" - Error Message: {result.get('message', 'Unknown error.')}",
+                    {"fields": {"subscription": torrent.uploader, "torrent": torrent.title, "phase": "notify"}}
                 )
                 errors.append(torrent)
             Logger.debug()
+    finally:
+        # After an unexpected error, the remaining torrents are still sorted into successes and errors, and the download stage never waits on a full queue
+        while item is None or item[2] is not None:
+            item = notify_queue.get()
+            if item[2] is not None:
+                (successes if item[3].get('status') == 200 else errors).append(item[2])
+
+
+def fetch(scheduler: sched, watcher: Watcher, interval: int, webhooker: Webhooker, tenant: Tenant = None) -> None:
+    """
+    Fetches all new torrents and schedules the next check.
+    The feeds are fetched, the torrents are downloaded and the notifications are sent in concurrent stages connected by bounded queues,
+    so the torrents of a subscription are downloaded while the next feeds are fetched. Waiting torrents are downloaded and notified highest `priority` first, then oldest first.
+    :param scheduler: The scheduler object used to schedule the next check.
+    :param watcher: The Watcher object used to fetch all new torrents.
+    :param interval: The interval (in seconds) at which to check for new torrents.
+    :param webhooker: The Webhooker object used to send Discord notifications.
+    :param tenant: The tenant of the watcher, in multi-tenant mode (Defaults to `None`).
+    :return: None
+    """
+
+    if tenant is not None:
+        Tenants.activate(tenant)
+        Logger.log(f"Tenant '{tenant.name}':", {"white_lines": "t"})
+
+    download_queue = PriorityQueue(maxsize=get_queue_size())
+    notify_queue = PriorityQueue(maxsize=get_queue_size())
+    successes = list()
+    errors = list()
+    deferred = list()
+
+    downloaded = {entry.get('nyaa_hash') for entry in watcher.history.get('downloads', [])}
+    deadline = get_cycle_deadline(interval)
+    started = time.monotonic()
+    Requester.set_deadline(deadline)
+
+    downloader = threading.Thread(target=_download_stage, args=(download_queue, notify_queue), name="download", daemon=True)
+    notifier = threading.Thread(target=_notify_stage, args=(notify_queue, webhooker, downloaded, successes, errors, deferred), name="notify", daemon=True)
+    downloader.start()
+    notifier.start()
 
+    def enqueue(torrents: list) -> None:
+        Logger.log(f" - Found {len(torrents)} new upload{'' if len(torrents) == 1 else 's'}. Downloading...")
+        for torrent in torrents:
+            _put(download_queue, torrent)
+
+    new_torrents, watcher.deferred = watcher.deferred, []
+    try:
+        # Torrents deferred by the previous search's deadline are queued first
+        if new_torrents:
+            Logger.log(f"Retrying {len(new_torrents)} deferred download{'' if len(new_torrents) == 1 else 's'}...")
+            for torrent in new_torrents:
+                watcher.queue_episode(torrent.title)
+                _put(download_queue, torrent)
+        new_torrents = new_torrents + watcher.fetch_all_feeds(enqueue)
+    finally:
+        _put(download_queue, None)
+        downloader.join()
+        notifier.join()
+        Requester.set_deadline(None)
+        watcher.deferred = deferred
+        watcher.finish_episodes(successes)
+        watcher.save_waiting()
+
+    # No new torrents
+    if len(new_torrents) == 0:
+        Logger.log("Found 0 new uploads.")
+
+    # New torrents
+    else:
         watcher.append_to_history(successes)
         Config.append_to_history(successes, errors)
 
-        error_string = f" Finished with {len(errors)} error{'' if len(errors) == 1 else 's'}." if len(errors) > 0 else ""
-        Logger.log(f"Done!{error_string if len(errors) > 0 else ''}")
+        # The stages sort every torrent into one outcome, so the counts add up to the found uploads
+        outcomes = [f"Downloaded {len(successes)}"]
+        if errors:
+            outcomes.append(f"{len(errors)} failed")
+        if deferred:
+            outcomes.append(f"{len(deferred)} deferred to the next search")
+        Logger.log(f"Found {len(new_torrents)} new upload{'' if len(new_torrents) == 1 else 's'}. {', '.join(outcomes)}.")
+
+    if watcher.pending:
+        Logger.log(f"{len(watcher.pending)} upload{' is' if len(watcher.pending) == 1 else 's are'} waiting for a preferred resolution.")
+
+    elapsed = time.monotonic() - started
+    if deadline is not None and (elapsed > deadline or deferred or watcher.deferred_subs):
+        Logger.log(
+            f"Deadline Overrun: The search took {elapsed:.1f} seconds ({deadline:.1f} second deadline). "
+            f"{len(deferred)} download{'' if len(deferred) == 1 else 's'} and {len(watcher.deferred_subs)} subscription{'' if len(watcher.deferred_subs) == 1 else 's'} "
+            f"were deferred to the next search."
+        )
+
+    Diagnostics.cycle()
 
     # Schedule next check
     interval_string = Config.get_interval_string(interval)
     Logger.log(f"Searching for new uploads in {interval_string}.")
-    scheduler.enter(interval, 1, fetch, (scheduler, watcher, interval, webhooker))
+    scheduler.enter(interval, 1, fetch, (scheduler, watcher, interval, webhooker, tenant))
 
 
 def truncate_title(string: str, username: str) -> str:
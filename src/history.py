@@ -0,0 +1,197 @@
+import os
+import re
+import sqlite3
+import threading
+from logger import Logger
+from updates import get_json_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    uploader TEXT,
+    torrent_title TEXT,
+    date TEXT,
+    nyaa_page TEXT,
+    nyaa_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_uploader ON entries (uploader COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS entries_kind ON entries (kind, date);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries (nyaa_hash);
+"""
+
+_INSERT = "INSERT INTO entries (kind, uploader, torrent_title, date, nyaa_page, nyaa_hash) VALUES (?, ?, ?, ?, ?, ?)"
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS titles USING fts5 (torrent_title, content='entries', content_rowid='id', tokenize='unicode61');
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO titles (rowid, torrent_title) VALUES (new.id, new.torrent_title);
+END;
+"""
+
+
+def _to_row(kind: str, entry: dict) -> tuple:
+    return (
+        kind,
+        entry.get('uploader'),
+        entry.get('torrent_title'),
+        entry.get('date_downloaded') if kind == "download" else entry.get('date_failed'),
+        entry.get('nyaa_page'),
+        (entry.get('nyaa_hash') or "").lower() or None
+    )
+
+
+def _to_match_query(text: str) -> str:
+    # Each word is quoted, so titles are matched by words regardless of FTS5 operators and punctuation in the search text
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' if i == len(words) - 1 else f'"{word}"' for i, word in enumerate(words))
+
+
+class HistoryIndex:
+    """
+    SQLite index of the 'history.json' downloads and errors, with full-text search over torrent titles.
+    The index is kept next to 'history.json' and is updated whenever entries are appended to the history.
+    """
+
+    lock = threading.Lock()
+    fts: bool | None = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Gets the `HISTORY_INDEX` environment variable.
+        :return: `True` if the history index is maintained (Defaults to `True`).
+        """
+
+        return os.environ.get("HISTORY_INDEX", "true").lower() == "true"
+
+    @staticmethod
+    def get_path() -> str:
+        """
+        Gets the path of the history index database.
+        :return: The path of the database, next to 'history.json' (E.g., `/watcher/history.db`).
+        """
+
+        return os.path.splitext(get_json_path("history"))[0] + ".db"
+
+    @staticmethod
+    def connect() -> sqlite3.Connection:
+        """
+        Opens the history index database, creating its tables on first use.
+        :return: A `sqlite3.Connection` object.
+        """
+
+        connection = sqlite3.connect(HistoryIndex.get_path(), timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+
+        if HistoryIndex.fts is None:
+            try:
+                connection.executescript(_FTS_SCHEMA)
+                HistoryIndex.fts = True
+            except sqlite3.OperationalError:
+                Logger.debug("SQLite was built without FTS5. Title searches will scan the history index.")
+                HistoryIndex.fts = False
+        elif HistoryIndex.fts:
+            connection.executescript(_FTS_SCHEMA)
+        return connection
+
+    @staticmethod
+    def add(downloads: list[dict], errors: list[dict]) -> None:
+        """
+        Adds 'history.json' entries to the history index.
+        :param downloads: A list of `downloads` entries.
+        :param errors: A list of `errors` entries.
+        :return: None
+        """
+
+        rows = [_to_row("download", entry) for entry in downloads] + [_to_row("error", entry) for entry in errors]
+        if not rows:
+            return
+
+        with HistoryIndex.lock:
+            connection = HistoryIndex.connect()
+            try:
+                with connection:
+                    connection.executemany(_INSERT, rows)
+            finally:
+                connection.close()
+
+    @staticmethod
+    def sync(history: dict) -> None:
+        """
+        Rebuilds the history index when its number of entries does not match 'history.json' (E.g., on first use, or after 'history.json' was edited).
+        :param history: The 'history.json' dictionary.
+        :return: None
+        """
+
+        downloads: list[dict] = history.get('downloads', [])
+        errors: list[dict] = history.get('errors', [])
+
+        with HistoryIndex.lock:
+            connection = HistoryIndex.connect()
+            try:
+                counts = dict(connection.execute("SELECT kind, COUNT(*) FROM entries GROUP BY kind").fetchall())
+                if counts.get("download", 0) == len(downloads) and counts.get("error", 0) == len(errors):
+                    return
+
+                Logger.log(f"Indexing {len(downloads) + len(errors)} history entries...")
+                with connection:
+                    connection.execute("DELETE FROM entries")
+                    if HistoryIndex.fts:
+                        connection.execute("INSERT INTO titles (titles) VALUES ('delete-all')")
+                    connection.executemany(_INSERT, [_to_row("download", entry) for entry in downloads] + [_to_row("error", entry) for entry in errors])
+            finally:
+                connection.close()
+
+    @staticmethod
+    def search(text: str = None, uploader: str = None, since: str = None, until: str = None, infohash: str = None, kind: str = None, limit: int = 50) -> list[dict]:
+        """
+        Searches the history index. Every given filter must match.
+        :param text: Words that the torrent title must contain. The last word can be a prefix (Defaults to `None`).
+        :param uploader: The name of the uploader, ignoring case (Defaults to `None`).
+        :param since: The earliest date (E.g., `2024-01-31`) (Defaults to `None`).
+        :param until: The latest date, inclusive (Defaults to `None`).
+        :param infohash: The Nyaa infohash of the torrent (Defaults to `None`).
+        :param kind: `download` or `error` (Defaults to `None`).
+        :param limit: The maximum number of results (Defaults to `50`).
+        :return: A list of dictionaries with the `kind`, `uploader`, `torrent_title`, `date`, `nyaa_page` and `nyaa_hash` values, newest first.
+        """
+
+        query = "SELECT entries.kind, entries.uploader, entries.torrent_title, entries.date, entries.nyaa_page, entries.nyaa_hash FROM entries"
+        conditions, parameters = [], []
+
+        connection = HistoryIndex.connect()
+        try:
+            if text and HistoryIndex.fts and _to_match_query(text):
+                query += " JOIN titles ON titles.rowid = entries.id"
+                conditions.append("titles MATCH ?")
+                parameters.append(_to_match_query(text))
+            elif text:
+                conditions.append("entries.torrent_title LIKE ?")
+                parameters.append(f"%{text}%")
+            if uploader:
+                conditions.append("entries.uploader = ? COLLATE NOCASE")
+                parameters.append(uploader)
+            if since:
+                conditions.append("entries.date >= ?")
+                parameters.append(since)
+            if until:
+                conditions.append("entries.date < ?")
+                parameters.append(until + "\uffff")  # Includes every time on the `until` date
+            if infohash:
+                conditions.append("entries.nyaa_hash = ?")
+                parameters.append(infohash.lower())
+            if kind:
+                conditions.append("entries.kind = ?")
+                parameters.append(kind)
+
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY entries.date DESC LIMIT ?"
+            parameters.append(limit)
+            return [dict(row) for row in connection.execute(query, parameters).fetchall()]
+        finally:
+            connection.close()
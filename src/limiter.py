@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from logger import Logger
+from urllib.parse import urlparse
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses the value of a `Retry-After` response header.
+    :param value: The header value, either in seconds or as an HTTP date.
+    :return: The number of seconds to wait. `None` if the value is missing or invalid.
+    """
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.strikes = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class Limiter:
+
+    buckets: dict[str, _Bucket] = {}
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        """
+        Gets the host of a URL, which is used as the key of its token bucket.
+        :param url: A URL.
+        :return: The lowercase host of the URL.
+        """
+
+        return (urlparse(url).hostname or "").lower()
+
+    @staticmethod
+    def _get_bucket(host: str) -> _Bucket:
+        bucket = Limiter.buckets.get(host)
+        if bucket is None:
+            rate = float(os.environ.get("RATE_LIMIT", 1))
+            burst = max(1, int(os.environ.get("RATE_LIMIT_BURST", 5)))
+            bucket = Limiter.buckets[host] = _Bucket(rate, burst)
+        return bucket
+
+    @staticmethod
+    def acquire(url: str, max_wait: float = None) -> bool:
+        """
+        Waits until a request to the host of a URL is allowed by its token bucket.
+        :param url: The URL that will be requested.
+        :param max_wait: The maximum number of seconds to wait (Defaults to `None`).
+        :return: `True` when the request is allowed. `False` if it would have to wait longer than `max_wait`.
+        """
+
+        host = Limiter.get_host(url)
+        with Limiter.lock:
+            bucket = Limiter._get_bucket(host)
+            if bucket.max_rate <= 0:
+                return True
+
+            now = time.monotonic()
+            bucket.refill(now)
+            wait = max(0.0, bucket.blocked_until - now)
+            if bucket.tokens < 1:
+                wait = max(wait, (1 - bucket.tokens) / bucket.rate)
+            if max_wait is not None and wait > max_wait:
+                return False
+            bucket.tokens -= 1  # Reserve the token before sleeping
+            state = f"tokens={max(bucket.tokens, 0):.1f}/{bucket.burst}, rate={bucket.rate:.2f}/s"
+
+        if wait > 0:
+            Logger.debug(f"Rate Limit: Waiting {wait:.2f} seconds for '{host}' ({state}).")
+            time.sleep(wait)
+        return True
+
+    @staticmethod
+    def throttled(url: str, status: int, retry_after: str = None) -> None:
+        """
+        Backs off requests to the host of a URL after a `429` or `503` response.
+        The request rate is halved on each consecutive throttled response and restored gradually by `succeeded()`.
+        :param url: The URL that was requested.
+        :param status: The HTTP status code of the response.
+        :param retry_after: The `Retry-After` header value of the response (Defaults to `None`).
+        :return: None
+        """
+
+        host = Limiter.get_host(url)
+        with Limiter.lock:
+            bucket = Limiter._get_bucket(host)
+            bucket.strikes += 1
+            wait = _parse_retry_after(retry_after)
+            if wait is None:
+                wait = min(300.0, 2.0 ** bucket.strikes)
+
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + wait)
+            if bucket.max_rate > 0:
+                bucket.rate = max(bucket.max_rate / 8, bucket.rate / 2)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            rate = bucket.rate
+
+        Logger.log(f"Rate Limit: '{host}' responded with HTTP {status}. Pausing requests for {wait:.0f} second{'' if round(wait) == 1 else 's'} (rate={rate:.2f}/s).")
+
+    @staticmethod
+    def succeeded(url: str) -> None:
+        """
+        Gradually restores the request rate of the host of a URL after a successful response.
+        :param url: The URL that was requested.
+        :return: None
+        """
+
+        host = Limiter.get_host(url)
+        with Limiter.lock:
+            bucket = Limiter._get_bucket(host)
+            if bucket.strikes == 0 and bucket.rate == bucket.max_rate:
+                return
+            bucket.strikes = 0
+            bucket.rate = min(bucket.max_rate, bucket.rate * 1.25)
+            rate = bucket.rate
+
+        Logger.debug(f"Rate Limit: Restored '{host}' request rate to {rate:.2f}/s.")
+
+    @staticmethod
+    def check_response(url: str, status: int | None, headers: dict = None) -> None:
+        """
+        Updates the token bucket of the host of a URL from a response.
+        :param url: The URL that was requested.
+        :param status: The HTTP status code of the response.
+        :param headers: The headers of the response (Defaults to `None`).
+        :return: None
+        """
+
+        if status in (429, 503):
+            Limiter.throttled(url, status, (headers or {}).get('retry-after'))
+        elif status is not None and status < 400:
+            Limiter.succeeded(url)
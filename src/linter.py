@@ -0,0 +1,224 @@
+import multiprocessing
+import queue
+import time
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python 3.10
+    import sre_constants
+    import sre_parse
+
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+# Characters of the `\d`, `\s` and `\w` classes up to the kana blocks, which cover the scripts of torrent titles
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: {c for c in range(0x3100) if chr(c).isdecimal()},
+    sre_constants.CATEGORY_SPACE: {c for c in range(0x3100) if chr(c).isspace()},
+    sre_constants.CATEGORY_WORD: {c for c in range(0x3100) if chr(c).isalnum() or c == ord("_")}
+}
+
+
+def _is_unbounded(high: int) -> bool:
+    return high == sre_constants.MAXREPEAT or high > 100
+
+
+def _first_chars(items) -> set | None:
+    """
+    Gets the characters that a parsed pattern can start with.
+    :param items: A parsed `SubPattern` or list of pattern items.
+    :return: A set of character codes. `None` if the pattern can start with any character or cannot be determined.
+    """
+
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            return {av}
+        if op == sre_constants.IN:
+            chars = set()
+            for in_op, in_av in av:
+                if in_op == sre_constants.LITERAL:
+                    chars.add(in_av)
+                elif in_op == sre_constants.RANGE and in_av[1] - in_av[0] < 256:
+                    chars.update(range(in_av[0], in_av[1] + 1))
+                elif in_op == sre_constants.CATEGORY and in_av in _CATEGORIES:
+                    chars.update(_CATEGORIES[in_av])
+                else:
+                    return None  # Negated sets and categories, e.g. '[^a]' and '\\D'
+            return chars
+        if op == sre_constants.SUBPATTERN:
+            return _first_chars(av[-1])
+        if op in _REPEATS and av[0] > 0:
+            return _first_chars(av[2])
+        if op == sre_constants.AT:
+            continue
+        return None
+    return None
+
+
+def _overlaps(first: set | None, second: set | None) -> bool:
+    return first is None or second is None or len(first & second) > 0
+
+
+def _get_branches(items) -> list:
+    """
+    Gets the alternations of a parsed pattern, including alternations within groups.
+    :param items: A parsed `SubPattern` or list of pattern items.
+    :return: A list of `BRANCH` arguments.
+    """
+
+    branches = []
+    for op, av in items:
+        if op == sre_constants.BRANCH:
+            branches.append(av)
+        elif op == sre_constants.SUBPATTERN:
+            branches += _get_branches(av[-1])
+    return branches
+
+
+def _walk(items, in_repeat: bool, warnings: list[str]) -> None:
+    """
+    Walks a parsed pattern and appends a warning for each construct that can backtrack catastrophically.
+    :param items: A parsed `SubPattern` or list of pattern items.
+    :param in_repeat: Whether the items are inside an unbounded quantifier.
+    :param warnings: The list of warnings to append to.
+    :return: None
+    """
+
+    previous = None
+    for op, av in items:
+        if op in _REPEATS:
+            low, high, sub = av
+            unbounded = _is_unbounded(high)
+            if unbounded and in_repeat:
+                warnings.append("nested quantifiers, e.g. '(a+)+'")
+            # Only repeats of the same pattern with nothing between them are ambiguous, e.g. '\d+.*' is matched in one pass
+            if unbounded and previous is not None and repr(previous) == repr(sub):
+                warnings.append("adjacent quantifiers that repeat the same pattern, e.g. '.*.*'")
+            if unbounded:
+                for branch_av in _get_branches(sub):
+                    branches = [_first_chars(branch) for branch in branch_av[1]]
+                    if any(_overlaps(a, b) for i, a in enumerate(branches) for b in branches[i + 1:]):
+                        warnings.append("a quantified alternation with overlapping branches, e.g. '(a|ab)*'")
+            _walk(sub, in_repeat or unbounded, warnings)
+            previous = sub if unbounded else None
+            continue
+
+        if op == sre_constants.SUBPATTERN:
+            _walk(av[-1], in_repeat, warnings)
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, in_repeat, warnings)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], in_repeat, warnings)
+        elif op == getattr(sre_constants, "ATOMIC_GROUP", None):
+            _walk(av, False, warnings)  # Atomic groups do not backtrack
+        elif op == getattr(sre_constants, "POSSESSIVE_REPEAT", None):
+            _walk(av[2], False, warnings)
+        previous = None
+
+
+def lint_pattern(pattern: str) -> list[str]:
+    """
+    Checks a regular expression pattern for constructs that can backtrack catastrophically.
+    :param pattern: A regular expression pattern.
+    :return: A list of warning messages. An empty list if no problems are found.
+    :except re.error: If the pattern is invalid.
+    """
+
+    warnings = []
+    _walk(sre_parse.parse(pattern), False, warnings)
+    return list(dict.fromkeys(warnings))  # Remove duplicates, keeping order
+
+
+def _time_rule(entry: dict, titles: list[str]) -> tuple[int, float, float]:
+    """
+    Times a watchlist entry against a corpus of torrent titles with `Rule.evaluate()`, the same code that `Watcher.fetch_feed()` runs.
+    :param entry: A `watchlist` entry.
+    :param titles: A list of torrent titles.
+    :return: A tuple of the number of matched titles, the total evaluation time and the longest evaluation time of a single title (in seconds).
+    """
+
+    from matcher import Rule  # The matcher imports the pattern parser from this module
+
+    rule = Rule(entry)
+    hits = 0
+    total = longest = 0.0
+    for title in titles:
+        start = time.perf_counter()
+        match = rule.evaluate(title, title.lower()).get('match')
+        elapsed = time.perf_counter() - start
+
+        hits += match
+        total += elapsed
+        longest = max(longest, elapsed)
+    return hits, total, longest
+
+
+def _time_rule_worker(entry: dict, titles: list[str], results: multiprocessing.Queue) -> None:
+    results.put(_time_rule(entry, titles))
+
+
+def _time_rule_with_timeout(entry: dict, titles: list[str], timeout: float) -> tuple[int, float, float] | None:
+    """
+    Times a watchlist entry in a separate process, which is stopped if it does not finish in time.
+    :param entry: A `watchlist` entry.
+    :param titles: A list of torrent titles.
+    :param timeout: The number of seconds to wait for the evaluation.
+    :return: The result of `_time_rule()`. `None` if the evaluation did not finish in time.
+    """
+
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_time_rule_worker, args=(entry, titles, results), daemon=True)
+    process.start()
+    try:
+        return results.get(timeout=timeout)
+    except queue.Empty:
+        return None
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def profile_rules(subscriptions: list[dict], titles: list[str], slow_ms: float = 5.0, timeout: float = 10.0) -> list[dict]:
+    """
+    Evaluates every watchlist entry against a corpus of torrent titles with `Rule.evaluate()`, the same code that `Watcher.fetch_feed()` runs.
+    Entries with patterns flagged by `lint_pattern()` are evaluated in a separate process, and are reported as timed out if they do not finish in time.
+    :param subscriptions: The `subscriptions` property from 'subscriptions.json'.
+    :param titles: A list of torrent titles.
+    :param slow_ms: The evaluation time (in milliseconds) of a single title that flags a rule as slow (Defaults to `5.0`).
+    :param timeout: The number of seconds a flagged entry can take to evaluate every title (Defaults to `10.0`).
+    :return: A list of dictionaries with the `subscription`, `watchlist`, `evaluations`, `hits`, `hit_rate`, `total_ms`, `mean_us`,
+        `max_ms`, `timed_out` and `warnings` values of each watchlist entry. Timed out entries are first, then entries ordered by `total_ms` in descending order.
+    """
+
+    report = []
+    for sub in subscriptions:
+        for entry in sub.get('watchlist', []):
+            warnings = []
+            for pattern in entry.get('regex', []) + entry.get('exclude_regex', []):
+                warnings += [f"'{pattern}': {warning}" for warning in lint_pattern(pattern)]
+
+            result = _time_rule_with_timeout(entry, titles, timeout) if warnings else _time_rule(entry, titles)
+            timed_out = result is None
+            hits, total, longest = result if not timed_out else (0, timeout, timeout)
+
+            if timed_out:
+                warnings.append(f"evaluation did not finish within {timeout:g} seconds")
+            elif longest * 1000 >= slow_ms:
+                warnings.append(f"slow evaluation: {longest * 1000:.1f} ms for a single title")
+
+            report.append({
+                "subscription": sub.get('username'),
+                "watchlist": entry.get('name') or "Unknown Watchlist",
+                "evaluations": len(titles),
+                "hits": hits,
+                "hit_rate": hits / len(titles) if titles and not timed_out else 0.0,
+                "total_ms": total * 1000,
+                "mean_us": total / len(titles) * 1000000 if titles and not timed_out else 0.0,
+                "max_ms": longest * 1000,
+                "timed_out": timed_out,
+                "warnings": warnings
+            })
+
+    report.sort(key=lambda rule: (rule.get('timed_out'), rule.get('total_ms')), reverse=True)
+    return report
@@ -1,11 +1,83 @@
+import copy
+import json
 import logging
 import os
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 
 log = logging.getLogger("main")
 
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class _JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"time": self.formatTime(record, _DATE_FORMAT), "level": record.levelname, "message": record.getMessage()}
+        data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default `prepare()` formats the traceback into the message and clears `exc_info`, which the JSON format writes to its own field
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
 
 class Logger:
 
+    listener: QueueListener | None = None
+
+    @staticmethod
+    def is_json() -> bool:
+        """
+        Gets the `LOG_FORMAT` environment variable.
+        :return: `True` if each message is logged as one JSON record (Defaults to `False`).
+        """
+
+        return os.environ.get("LOG_FORMAT", "text").lower() == "json"
+
+    @staticmethod
+    def setup() -> None:
+        """
+        Configures the root logger with the `LOG_LEVEL`, `LOG_FORMAT` and `LOG_QUEUE` environment variables.
+        When `LOG_QUEUE` is `true`, records are written by a background thread, so logging does not wait for slow output.
+        :return: None
+        """
+
+        Logger.stop()
+        handler = logging.StreamHandler()
+        handler.setFormatter(_JsonFormatter() if Logger.is_json() else logging.Formatter("%(asctime)s %(levelname)-8s %(message)s", _DATE_FORMAT))
+
+        if os.environ.get("LOG_QUEUE", "false").lower() == "true":
+            queue = SimpleQueue()
+            Logger.listener = QueueListener(queue, handler)
+            Logger.listener.start()
+            handler = _QueueHandler(queue)
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    @staticmethod
+    def stop() -> None:
+        """
+        Writes the queued records and stops the background thread of `LOG_QUEUE`.
+        :return: None
+        """
+
+        if Logger.listener is not None:
+            Logger.listener.stop()
+            Logger.listener = None
+
     @staticmethod
     def log(messages: str | list = "", options: dict = None) -> None:
         """
@@ -16,6 +88,7 @@ class Logger:
                 The `exc_info` key specifies whether exception information is logged (Defaults to `False`).
                 The `tip` key specifies whether the message is a tip (Defaults to `False`).
                 The `white_lines` key can be used to specify whether white lines should be logged before and/or after the message (`t`, `b`, or `tb`).
+                The `fields` key specifies a dictionary of values added to JSON records (E.g., `subscription`, `torrent` and `phase`).
         :return: None
         """
 
@@ -25,6 +98,18 @@ class Logger:
 
         if options and options.get('tip') is True and log_tips is False:
             return
+        if not log.isEnabledFor(level_num):
+            return
+
+        # Each message is one record with its lines joined, and white lines are left out
+        if Logger.is_json():
+            message = "\n".join(messages if messages.__class__ == list else [messages]).strip("\n")
+            if message:
+                fields = dict(options.get('fields') or {}) if options else {}
+                if options and options.get('tip') is True:
+                    fields['tip'] = True
+                log.log(level_num, message, exc_info=exc_info, extra={"fields": fields})
+            return
 
         if options and options.get('white_lines') and "t" in options.get('white_lines'):
             log.log(level_num, "")
@@ -51,6 +136,7 @@ class Logger:
                 The `exc_info` key specifies whether exception information is logged (Defaults to `False`).
                 The `tip` key specifies whether the message is a tip (Defaults to `False`).
                 The `white_lines` key can be used to specify whether white lines should be logged before and/or after the message (`t`, `b`, or `tb`).
+                The `fields` key specifies a dictionary of values added to JSON records (E.g., `subscription`, `torrent` and `phase`).
         :return: None
         """
         
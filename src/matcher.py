@@ -0,0 +1,155 @@
+import os
+import re
+from linter import sre_constants, sre_parse
+
+
+def _get_trigrams(string: str) -> set[str]:
+    return {string[i:i + 3] for i in range(len(string) - 2)}
+
+
+def _has_ignorecase(items) -> bool:
+    for op, av in items:
+        if op == sre_constants.SUBPATTERN and (av[1] & sre_constants.SRE_FLAG_IGNORECASE or _has_ignorecase(av[-1])):
+            return True
+    return False
+
+
+def _get_literal_runs(items, runs: list[str]) -> None:
+    """
+    Appends the runs of literal characters that every match of a parsed pattern must contain.
+    Only ASCII characters are used, so lowercasing a run gives the same characters as lowercasing the title.
+    :param items: A parsed `SubPattern` or list of pattern items.
+    :param runs: The list of literal runs to append to.
+    :return: None
+    """
+
+    run = ""
+    for op, av in items:
+        if op == sre_constants.LITERAL and av < 128:
+            run += chr(av)
+            continue
+
+        runs.append(run)
+        run = ""
+        if op == sre_constants.SUBPATTERN:
+            _get_literal_runs(av[-1], runs)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] > 0:
+            _get_literal_runs(av[2], runs)
+    runs.append(run)
+
+
+def get_required_literal(pattern: str) -> str | None:
+    """
+    Gets the longest literal string that every match of a regular expression pattern must contain.
+    :param pattern: A regular expression pattern.
+    :return: The lowercase literal string. `None` if the pattern has no literal of at least 3 characters or ignores case.
+    """
+
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE or _has_ignorecase(parsed):
+        return None  # Case-insensitive literals can match non-ASCII characters that lowercase differently
+
+    runs = []
+    _get_literal_runs(parsed, runs)
+    literal = max(runs, key=len)
+    return literal.lower() if len(literal) >= 3 else None
+
+
+def _pick_trigram(literal: str) -> str:
+    # Trigrams without spaces or digits are less common in titles, so they filter more rules
+    trigrams = [literal[i:i + 3] for i in range(len(literal) - 2)]
+    return next((trigram for trigram in trigrams if trigram.isalpha()), trigrams[0])
+
+
+class Rule:
+    """
+    A compiled watchlist entry.
+    """
+
+    __slots__ = ("entry", "tags", "lower_tags", "regexes", "ex_regexes", "patterns", "ex_patterns", "keys")
+
+    def __init__(self, entry: dict) -> None:
+        self.entry = entry
+        self.tags: list[str] = entry.get("tags", [])
+        self.lower_tags = [tag.lower() for tag in self.tags]
+        self.regexes: list[str] = entry.get("regex", [])
+        self.ex_regexes: list[str] = entry.get("exclude_regex", [])
+        self.patterns = [re.compile(pattern) for pattern in self.regexes]
+        self.ex_patterns = [re.compile(pattern) for pattern in self.ex_regexes]
+
+        # Each key set holds trigrams of which a title must contain at least one to possibly match
+        self.keys: list[set[str]] = []
+        if self.tags and all(len(tag) >= 3 for tag in self.lower_tags):
+            self.keys.append({_pick_trigram(tag) for tag in self.lower_tags})
+        if self.regexes:
+            literals = [get_required_literal(pattern) for pattern in self.regexes]
+            if all(literals):
+                self.keys.append({_pick_trigram(literal) for literal in literals})
+
+    def evaluate(self, title: str, lower_title: str = None) -> dict:
+        """
+        Evaluates a torrent title against the watchlist entry.
+        :param title: The title of the torrent.
+        :param lower_title: The lowercase title of the torrent (Defaults to `None`).
+        :return: A dictionary with the `tag_match`, `regex_match`, `ex_regex_match` and `match` values.
+        """
+
+        lower_title = lower_title if lower_title is not None else title.lower()
+        tag_match = any(tag in lower_title for tag in self.lower_tags)
+        regex_match = any(pattern.search(title) for pattern in self.patterns)
+        ex_regex_match = any(pattern.search(title) for pattern in self.ex_patterns)
+
+        match: bool = (tag_match or not self.tags) and (regex_match or not self.regexes) and not ex_regex_match
+        return {"tag_match": tag_match, "regex_match": regex_match, "ex_regex_match": ex_regex_match, "match": match}
+
+
+class Matcher:
+    """
+    Routes torrent titles to the watchlist entries that can match them.
+    Tags and the required literals of regex patterns are indexed by trigram, so each title is tokenized once
+    and only the entries that share a trigram with it are fully evaluated. Entries without indexable literals are always evaluated.
+    Watchlists with fewer than `MATCHER_INDEX_MIN_RULES` entries are not indexed, since evaluating every entry is faster than tokenizing the title.
+    """
+
+    def __init__(self, watchlist: list[dict]) -> None:
+        self.watchlist = watchlist
+        self.rules = [Rule(entry) for entry in watchlist]
+        self.index: dict[str, list[int]] = {}
+        self.unindexed: list[int] = []
+        self.indexed = len(self.rules) >= Matcher.get_index_min_rules()
+
+        for position, rule in enumerate(self.rules if self.indexed else []):
+            if not rule.keys:
+                self.unindexed.append(position)
+                continue
+            for key in rule.keys[0]:
+                self.index.setdefault(key, []).append(position)
+
+    @staticmethod
+    def get_index_min_rules() -> int:
+        """
+        Gets the `MATCHER_INDEX_MIN_RULES` environment variable.
+        :return: The number of watchlist entries from which a watchlist is indexed (Defaults to `16`). `0` indexes every watchlist.
+        """
+
+        return max(0, int(os.environ.get("MATCHER_INDEX_MIN_RULES", 16)))
+
+    def candidates(self, lower_title: str) -> list[Rule]:
+        """
+        Gets the watchlist entries that can match a torrent title.
+        :param lower_title: The lowercase title of the torrent.
+        :return: A list of `Rule` objects, in watchlist order. Every entry if the watchlist is not indexed.
+        """
+
+        if not self.indexed:
+            return self.rules
+
+        trigrams = _get_trigrams(lower_title)
+        positions = set(self.unindexed)
+        for trigram in trigrams:
+            positions.update(self.index.get(trigram, ()))
+
+        return [
+            self.rules[position] for position in sorted(positions)
+            if all(not keys.isdisjoint(trigrams) for keys in self.rules[position].keys[1:])
+        ]
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from limiter import Limiter
+from logger import Logger
+from urllib.parse import urlsplit, urlunsplit
+
+
+class _Mirror:
+
+    def __init__(self, url: str) -> None:
+        parts = urlsplit(url.strip().rstrip("/"))
+        self.scheme = parts.scheme or "https"
+        self.netloc = parts.netloc.lower()
+        self.latency: float | None = None
+        self.healthy = True
+
+    def get_url(self) -> str:
+        return f"{self.scheme}://{self.netloc}"
+
+
+class Mirrors:
+    """
+    Rewrites feed and torrent URLs to the fastest healthy Nyaa mirror from the `MIRRORS` environment variable.
+    The mirrors are probed in the background, and a failed request is retried on the next mirror in the same search.
+    """
+
+    mirrors: list[_Mirror] | None = None
+    lock = threading.Lock()
+    thread: threading.Thread | None = None
+    stop_event = threading.Event()
+
+    @staticmethod
+    def get_mirrors() -> list[_Mirror]:
+        """
+        Gets the mirrors from the `MIRRORS` environment variable, parsing it on first use.
+        :return: A list of mirrors, in the configured order. An empty list if no mirrors are configured.
+        """
+
+        if Mirrors.mirrors is None:
+            urls = [url for url in os.environ.get("MIRRORS", "").split(",") if url.strip()]
+            Mirrors.mirrors = [_Mirror(url) for url in urls]
+        return Mirrors.mirrors
+
+    @staticmethod
+    def get_probe_seconds() -> float:
+        """
+        Gets the `MIRROR_PROBE_SEC` environment variable.
+        :return: The number of seconds between probes of the mirrors (Defaults to `300`).
+        """
+
+        return max(10.0, float(os.environ.get("MIRROR_PROBE_SEC", 300)))
+
+    @staticmethod
+    def start() -> None:
+        """
+        Starts probing the mirrors in a background thread.
+        :return: None
+        """
+
+        if len(Mirrors.get_mirrors()) < 2 or Mirrors.thread is not None:
+            return
+
+        Mirrors.stop_event.clear()
+        Mirrors.thread = threading.Thread(target=Mirrors._run, name="mirrors", daemon=True)
+        Mirrors.thread.start()
+
+    @staticmethod
+    def stop() -> None:
+        """
+        Stops probing the mirrors.
+        :return: None
+        """
+
+        Mirrors.stop_event.set()
+        Mirrors.thread = None
+
+    @staticmethod
+    def _run() -> None:
+        while not Mirrors.stop_event.is_set():
+            Mirrors.probe()
+            Mirrors.stop_event.wait(Mirrors.get_probe_seconds())
+
+    @staticmethod
+    def probe() -> None:
+        """
+        Measures the response time of each mirror's RSS feed, marking mirrors that do not respond, or respond with a server error, as unhealthy.
+        :return: None
+        """
+
+        from requester import Requester
+
+        for mirror in Mirrors.get_mirrors():
+            # Probes count against the rate limit of the mirror's host, but not against the deadline of the current search
+            url = f"{mirror.get_url()}/?page=rss&q="
+            Limiter.acquire(url)
+            start = time.monotonic()
+            try:
+                response = Requester.get_session(url).get(url, timeout=Requester.get_timeouts())
+                Limiter.check_response(url, response.status_code, response.headers)
+                healthy = response.status_code < 500 and response.status_code != 429
+            except Exception as e:
+                Logger.debug(f"Mirror Probe: {mirror.netloc} failed: {e}")
+                healthy = False
+
+            with Mirrors.lock:
+                mirror.latency = time.monotonic() - start if healthy else None
+                mirror.healthy = healthy
+
+        ranked = ", ".join(f"{mirror.netloc} ({f'{mirror.latency * 1000:.0f} ms' if mirror.healthy else 'down'})" for mirror in Mirrors.get_ranked())
+        Logger.debug(f"Mirror Probe: {ranked}")
+
+    @staticmethod
+    def get_ranked() -> list[_Mirror]:
+        """
+        Gets the mirrors ordered by health and response time.
+        :return: A list of mirrors: healthy mirrors from fastest to slowest, then unhealthy mirrors.
+        """
+
+        with Mirrors.lock:
+            return sorted(Mirrors.get_mirrors(), key=lambda mirror: (not mirror.healthy, mirror.latency if mirror.latency is not None else float("inf")))
+
+    @staticmethod
+    def get_candidates(url: str) -> list[tuple[str, _Mirror | None]]:
+        """
+        Gets the URLs to request, in order, for a URL on one of the mirrors.
+        :param url: A feed or torrent URL.
+        :return: A list of tuples with the rewritten URL and its mirror, from the fastest healthy mirror.
+            A list with only the URL if its host is not a mirror.
+        """
+
+        mirrors = Mirrors.get_mirrors()
+        parts = urlsplit(url)
+        if not any(mirror.netloc == parts.netloc.lower() for mirror in mirrors):
+            return [(url, None)]
+        return [(urlunsplit(parts._replace(scheme=mirror.scheme, netloc=mirror.netloc)), mirror) for mirror in Mirrors.get_ranked()]
+
+    @staticmethod
+    def failed(mirror: _Mirror | None) -> None:
+        """
+        Marks a mirror as unhealthy after a failed request, until the next probe.
+        :param mirror: The mirror of the failed request.
+        :return: None
+        """
+
+        if mirror is None:
+            return
+        with Mirrors.lock:
+            if mirror.healthy:
+                Logger.log(f"Mirror Error: '{mirror.netloc}' failed. Switching to the next mirror.")
+            mirror.healthy = False
@@ -0,0 +1,164 @@
+import os
+import requests
+import threading
+import time
+from config import Config
+from limiter import Limiter
+from mirrors import Mirrors
+from requests.adapters import HTTPAdapter
+
+
+class DeadlineExceeded(requests.Timeout):
+    """
+    Raised when a request cannot finish before the deadline of the current check.
+    """
+
+
+class _Session(requests.Session):
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # Applies the default timeouts to every request, including requests sent by discord.py
+        kwargs.setdefault('timeout', Requester.get_timeouts())
+        return super().request(method, url, **kwargs)
+
+
+class Requester:
+
+    sessions: dict[str, requests.Session] = {}
+    lock = threading.Lock()
+    deadline: float | None = None
+
+    @staticmethod
+    def get_timeouts() -> tuple[float, float]:
+        """
+        Gets the `REQUEST_CONNECT_TIMEOUT` and `REQUEST_READ_TIMEOUT` environment variables.
+        :return: A tuple of the connect and read timeouts in seconds (Defaults to `10` and `30`).
+        """
+
+        return (
+            float(os.environ.get("REQUEST_CONNECT_TIMEOUT", 10)),
+            float(os.environ.get("REQUEST_READ_TIMEOUT", 30))
+        )
+
+    @staticmethod
+    def set_deadline(seconds: float | None) -> None:
+        """
+        Sets the deadline of the current check. Requests are not started after the deadline, and their timeouts are clipped to the time left.
+        :param seconds: The number of seconds from now until the deadline. `None` removes the deadline.
+        :return: None
+        """
+
+        Requester.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    @staticmethod
+    def get_remaining() -> float | None:
+        """
+        Gets the time left until the deadline of the current check.
+        :return: The number of seconds left, which is negative after the deadline. `None` if there is no deadline.
+        """
+
+        return Requester.deadline - time.monotonic() if Requester.deadline is not None else None
+
+    @staticmethod
+    def is_expired() -> bool:
+        """
+        Checks if the deadline of the current check has passed.
+        :return: `True` if the deadline has passed. `False` if there is time left or no deadline.
+        """
+
+        remaining = Requester.get_remaining()
+        return remaining is not None and remaining <= 0
+
+    @staticmethod
+    def get_user_agent() -> str:
+        """
+        Gets the `USER_AGENT` environment variable.
+        :return: The user agent sent with every request (Defaults to `nyaa-watcher/{version}`).
+        """
+
+        return os.environ.get("USER_AGENT", f"nyaa-watcher/{Config.version}")
+
+    @staticmethod
+    def get_session(url: str) -> requests.Session:
+        """
+        Gets the pooled keep-alive session of the host of a URL, creating it if needed.
+        :param url: A URL.
+        :return: A `requests.Session` object that is shared by all requests to the host.
+        """
+
+        host = Limiter.get_host(url)
+        with Requester.lock:
+            session = Requester.sessions.get(host)
+            if session is None:
+                pool_size = max(1, int(os.environ.get("REQUEST_POOL_SIZE", 4)))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+
+                session = _Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "User-Agent": Requester.get_user_agent(),
+                    "Accept-Encoding": "gzip, deflate"
+                })
+                Requester.sessions[host] = session
+        return session
+
+    @staticmethod
+    def get(url: str, **kwargs) -> requests.Response:
+        """
+        Sends a rate-limited GET request through the session of the URL's host.
+        URLs on a `MIRRORS` host are sent to the fastest healthy mirror, and are retried on the next mirror if the request fails.
+        :param url: The URL to request.
+        :param kwargs: Additional arguments passed to `requests.Session.get()`.
+        :return: The `requests.Response` object.
+        :except DeadlineExceeded: If the deadline of the current check has passed, or would pass while waiting for the rate limit.
+        :except requests.RequestException: If the request fails or times out on every mirror.
+        """
+
+        candidates = Mirrors.get_candidates(url)
+        for position, (candidate, mirror) in enumerate(candidates):
+            is_last = position == len(candidates) - 1
+            try:
+                response = Requester._get(candidate, **kwargs)
+            except DeadlineExceeded:
+                raise
+            except requests.RequestException:
+                Mirrors.failed(mirror)
+                if is_last or Requester.is_expired():
+                    raise
+                continue
+
+            if response.status_code < 500 and response.status_code != 429:
+                return response
+            Mirrors.failed(mirror)
+            if is_last:
+                return response
+
+    @staticmethod
+    def _get(url: str, **kwargs) -> requests.Response:
+        remaining = Requester.get_remaining()
+        if remaining is not None:
+            if remaining <= 0 or not Limiter.acquire(url, remaining):
+                raise DeadlineExceeded(f"The deadline of the current search has passed before requesting {url}.")
+            timeout = kwargs.get('timeout') or Requester.get_timeouts()
+            connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)  # A number is both timeouts, as in `requests`
+            remaining = max(Requester.get_remaining(), 0.001)
+            kwargs['timeout'] = (min(connect or remaining, remaining), min(read or remaining, remaining))
+        else:
+            Limiter.acquire(url)
+
+        response = Requester.get_session(url).get(url, **kwargs)
+        Limiter.check_response(url, response.status_code, response.headers)
+        return response
+
+    @staticmethod
+    def close() -> None:
+        """
+        Closes all sessions and their pooled connections.
+        :return: None
+        """
+
+        with Requester.lock:
+            for session in Requester.sessions.values():
+                session.close()
+            Requester.sessions.clear()
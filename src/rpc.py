@@ -0,0 +1,153 @@
+import base64
+import os
+from logger import Logger
+from requester import Requester
+from store import TorrentStore
+from torrent import Torrent
+
+
+def _get_torrent_file(torrent: Torrent) -> bytes:
+    """
+    Gets the contents of a torrent file from the torrent store, or downloads it into the store.
+    :param torrent: A `Torrent` object.
+    :return: The contents of the torrent file.
+    :except Exception: If the torrent file cannot be downloaded.
+    """
+
+    stored_path = TorrentStore.get(torrent.nyaa_infohash)
+    if not stored_path:
+        response = Requester.get(torrent.link)
+        if response.status_code != 200:
+            raise Exception(f"Error occurred while downloading (HTTP Status Code: {response.status_code}).")
+        stored_path = TorrentStore.add(torrent.nyaa_infohash, response.content)
+        if not stored_path:
+            return response.content
+
+    with open(stored_path, "rb") as f:
+        return f.read()
+
+
+def _get_client_url() -> str:
+    url = os.environ.get("CLIENT_URL", "")
+    if not url:
+        raise Exception("The 'CLIENT_URL' environment variable is required to send torrents to a torrent client.")
+    return url.rstrip("/")
+
+
+def _send_as_files() -> bool:
+    return os.environ.get("CLIENT_SEND_AS", "magnet").lower() == "torrent"
+
+
+def _results(torrents: list, status: int, message: str, client: str) -> list[dict]:
+    return [{"status": status, "message": message, "client": client} for _ in torrents]
+
+
+def add_to_qbittorrent(torrents: list[Torrent], magnets: list[str]) -> list[dict]:
+    """
+    Adds a batch of torrents to qBittorrent.
+    Magnet links (or torrent page links when a torrent has no infohash) are sent as `urls` in a single Web API request.
+    When `CLIENT_SEND_AS` is `torrent`, each torrent file is uploaded in its own request, so a torrent that fails does not fail the others.
+    :param torrents: A list of `Torrent` objects.
+    :param magnets: A list of magnet links for `torrents`, in the same order. `None` values use the torrent's `link` value.
+    :return: A list of dictionaries containing the status of each torrent, in the same order as `torrents`.
+    """
+
+    try:
+        url = _get_client_url()
+    except Exception as e:
+        return _results(torrents, 500, str(e), "qBittorrent")
+    session = Requester.get_session(url)
+
+    def login() -> None:
+        response = session.post(f"{url}/api/v2/auth/login", data={
+            "username": os.environ.get("CLIENT_USERNAME", ""),
+            "password": os.environ.get("CLIENT_PASSWORD", "")
+        })
+        if response.status_code != 200 or response.text.strip() != "Ok.":
+            raise Exception(f"Cannot log in to qBittorrent (HTTP Status Code: {response.status_code}).")
+
+    def add(batch: list[Torrent], data: dict, files: list = None) -> list[dict]:
+        response = session.post(f"{url}/api/v2/torrents/add", data=data, files=files)
+        if response.status_code == 403:  # Not logged in or the session expired
+            login()
+            response = session.post(f"{url}/api/v2/torrents/add", data=data, files=files)
+
+        if response.status_code != 200 or response.text.strip() != "Ok.":
+            return _results(batch, response.status_code if response.status_code != 200 else 500, f"qBittorrent did not add the torrent: {response.text.strip()}", "qBittorrent")
+        return _results(batch, 200, "success", "qBittorrent")
+
+    if not _send_as_files():
+        try:
+            return add(torrents, {"urls": "\n".join(magnet or torrent.link for torrent, magnet in zip(torrents, magnets))})
+        except Exception as e:
+            return _results(torrents, 500, str(e), "qBittorrent")
+
+    results = list()
+    for torrent in torrents:
+        try:
+            files = [("torrents", (f"{torrent.nyaa_infohash or 'torrent'}.torrent", _get_torrent_file(torrent), "application/x-bittorrent"))]
+            results += add([torrent], {}, files)
+        except Exception as e:
+            results.append({"status": 500, "message": str(e), "client": "qBittorrent"})
+    return results
+
+
+def add_to_transmission(torrents: list[Torrent], magnets: list[str]) -> list[dict]:
+    """
+    Adds a batch of torrents to Transmission over a single RPC session.
+    Transmission's `torrent-add` method only accepts one torrent per call, so the calls share the pooled connection and session ID.
+    :param torrents: A list of `Torrent` objects.
+    :param magnets: A list of magnet links for `torrents`, in the same order. `None` values use the torrent's `link` value.
+    :return: A list of dictionaries containing the status of each torrent, in the same order as `torrents`.
+    """
+
+    try:
+        url = _get_client_url() + "/transmission/rpc"
+    except Exception as e:
+        return _results(torrents, 500, str(e), "Transmission")
+
+    session = Requester.get_session(url)
+    username = os.environ.get("CLIENT_USERNAME")
+    if username:
+        session.auth = (username, os.environ.get("CLIENT_PASSWORD", ""))
+
+    results = list()
+    for torrent, magnet in zip(torrents, magnets):
+        try:
+            if _send_as_files():
+                arguments = {"metainfo": base64.b64encode(_get_torrent_file(torrent)).decode("ascii")}
+            else:
+                arguments = {"filename": magnet or torrent.link}
+
+            payload = {"method": "torrent-add", "arguments": arguments}
+            response = session.post(url, json=payload)
+            if response.status_code == 409:  # Missing or expired session ID
+                session.headers['X-Transmission-Session-Id'] = response.headers.get('X-Transmission-Session-Id', "")
+                response = session.post(url, json=payload)
+
+            result = response.json().get('result') if response.status_code == 200 else None
+            if result == "success":
+                results.append({"status": 200, "message": "success", "client": "Transmission"})
+            else:
+                results.append({"status": response.status_code if response.status_code != 200 else 500, "message": f"Transmission did not add the torrent: {result or response.text.strip()}", "client": "Transmission"})
+        except Exception as e:
+            results.append({"status": 500, "message": str(e), "client": "Transmission"})
+    return results
+
+
+def add_to_client(client: str, torrents: list[Torrent], magnets: list[str]) -> list[dict]:
+    """
+    Adds a batch of torrents to a torrent client.
+    :param client: The name of the torrent client (`qbittorrent` or `transmission`).
+    :param torrents: A list of `Torrent` objects.
+    :param magnets: A list of magnet links for `torrents`, in the same order. `None` values use the torrent's `link` value.
+    :return: A list of dictionaries containing the status of each torrent, in the same order as `torrents`.
+    """
+
+    if not torrents:
+        return []
+
+    Logger.log(f" - Sending {len(torrents)} torrent{'' if len(torrents) == 1 else 's'} to {'qBittorrent' if client == 'qbittorrent' else 'Transmission'}...")
+    if client == "qbittorrent":
+        return add_to_qbittorrent(torrents, magnets)
+    return add_to_transmission(torrents, magnets)
@@ -0,0 +1,164 @@
+import bisect
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from logger import Logger
+from updates import get_json_path
+
+
+def _hash(value: str) -> int:
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class Shard:
+    """
+    Partitions subscriptions across watcher workers with a consistent-hash ring.
+    Each worker holds a lease file in the shared watcher directory, which is renewed by a heartbeat thread.
+    When a lease expires, the worker is removed from the ring and its subscriptions are rebalanced to the remaining workers.
+    The ring is only refreshed at the start of each search, so two workers can own a subscription for one search during a handoff.
+    """
+
+    worker_id: str = ""
+    workers: list[str] = []
+    ring: list[tuple[int, str]] = []
+    heartbeat: threading.Thread | None = None
+    stopped = threading.Event()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Gets the `SHARDING` environment variable.
+        :return: `True` if subscriptions are partitioned across workers (Defaults to `True` when `WORKERS` is greater than 1).
+        """
+
+        default = "true" if int(os.environ.get("WORKERS", 1)) > 1 else "false"
+        return os.environ.get("SHARDING", default).lower() == "true"
+
+    @staticmethod
+    def get_lease_seconds() -> int:
+        """
+        Gets the `SHARD_LEASE_SEC` environment variable.
+        :return: The number of seconds a worker lease is valid without being renewed (Defaults to 60).
+        """
+
+        return max(10, int(os.environ.get("SHARD_LEASE_SEC", 60)))
+
+    @staticmethod
+    def get_lease_dir() -> str:
+        return os.path.join(os.path.dirname(get_json_path("config")), "leases")
+
+    @staticmethod
+    def start(worker_id: str = None) -> None:
+        """
+        Registers this process as a worker and starts renewing its lease.
+        :param worker_id: The unique ID of the worker (Defaults to the `WORKER_ID` environment variable, or the hostname and process ID).
+        :return: None
+        """
+
+        Shard.worker_id = worker_id or os.environ.get("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        os.makedirs(Shard.get_lease_dir(), exist_ok=True)
+        Shard.renew()
+
+        Shard.stopped.clear()
+        Shard.heartbeat = threading.Thread(target=Shard._heartbeat, name="shard-heartbeat", daemon=True)
+        Shard.heartbeat.start()
+        Logger.log(f"Started shard worker '{Shard.worker_id}'.")
+
+    @staticmethod
+    def stop() -> None:
+        """
+        Stops renewing the lease and removes it, so other workers take over immediately.
+        :return: None
+        """
+
+        Shard.stopped.set()
+        try:
+            os.remove(os.path.join(Shard.get_lease_dir(), f"{Shard.worker_id}.json"))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _heartbeat() -> None:
+        while not Shard.stopped.wait(Shard.get_lease_seconds() / 3):
+            try:
+                Shard.renew()
+            except Exception as e:
+                Logger.log(f"Shard Error: Cannot renew the lease of worker '{Shard.worker_id}'.")
+                Logger.debug(f"{e}", {"exc_info": True})
+
+    @staticmethod
+    def renew() -> None:
+        """
+        Writes this worker's lease file with a new expiry time.
+        :return: None
+        """
+
+        path = os.path.join(Shard.get_lease_dir(), f"{Shard.worker_id}.json")
+        file = open(path + ".tmp", "w")
+        file.write(json.dumps({"worker_id": Shard.worker_id, "expires": time.time() + Shard.get_lease_seconds()}))
+        file.close()
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def get_workers() -> list[str]:
+        """
+        Gets the IDs of all workers with a valid lease, and removes expired leases.
+        :return: A sorted list of worker IDs.
+        """
+
+        workers = {Shard.worker_id}
+        directory = Shard.get_lease_dir()
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                file = open(path, "r")
+                lease = json.loads(file.read())
+                file.close()
+            except (OSError, ValueError):
+                continue  # Lease is being replaced or was removed
+
+            if lease.get('expires', 0) >= time.time():
+                workers.add(lease.get('worker_id'))
+            else:
+                Logger.log(f"Shard worker '{lease.get('worker_id')}' lease expired. Rebalancing subscriptions...")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return sorted(workers)
+
+    @staticmethod
+    def refresh() -> bool:
+        """
+        Rebuilds the hash ring from the workers with a valid lease.
+        :return: `True` if the set of workers changed since the previous refresh.
+        """
+
+        workers = Shard.get_workers()
+        if workers == Shard.workers:
+            return False
+
+        Shard.workers = workers
+        Shard.ring = sorted((_hash(f"{worker}#{i}"), worker) for worker in workers for i in range(64))
+        Logger.log(f"Shard: {len(workers)} active worker{'' if len(workers) == 1 else 's'} ({', '.join(workers)}).")
+        return True
+
+    @staticmethod
+    def owns(sub: dict) -> bool:
+        """
+        Checks whether this worker owns a subscription.
+        :param sub: A dictionary of a subscription entry.
+        :return: `True` if the subscription is assigned to this worker.
+        """
+
+        if not Shard.ring:
+            return True
+
+        key = _hash(f"{sub.get('username')}|{sub.get('rss')}")
+        index = bisect.bisect(Shard.ring, (key, "")) % len(Shard.ring)
+        return Shard.ring[index][1] == Shard.worker_id
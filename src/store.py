@@ -0,0 +1,112 @@
+import os
+import re
+import shutil
+import threading
+from logger import Logger
+
+
+def _is_infohash(value: str) -> bool:
+    return bool(value) and re.fullmatch(r"[0-9a-f]{40}", value) is not None
+
+
+class TorrentStore:
+    """
+    Content-addressed store of downloaded torrent files, keyed by their Nyaa infohash.
+    Titled files in the downloads directory are hardlinked to the stored files.
+    """
+
+    index: dict[str, str] | None = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_directory() -> str:
+        """
+        Gets the `TORRENT_STORE_DIR` environment variable.
+        :return: The directory of the torrent store (Defaults to the `.store` directory within `DOWNLOADS_DIR`).
+        """
+
+        return os.environ.get("TORRENT_STORE_DIR", os.environ.get("DOWNLOADS_DIR", "/downloads") + "/.store")
+
+    @staticmethod
+    def _get_index() -> dict[str, str]:
+        """
+        Gets the index of stored torrent files, scanning the store directory on first use.
+        :return: A dictionary of infohashes and their file paths.
+        """
+
+        if TorrentStore.index is None:
+            directory = TorrentStore.get_directory()
+            os.makedirs(directory, exist_ok=True)
+
+            TorrentStore.index = {}
+            for filename in os.listdir(directory):
+                infohash, extension = os.path.splitext(filename)
+                if extension == ".torrent" and _is_infohash(infohash):
+                    TorrentStore.index[infohash] = os.path.join(directory, filename)
+            Logger.debug(f"Indexed {len(TorrentStore.index)} torrent file{'' if len(TorrentStore.index) == 1 else 's'} in '{directory}'.")
+        return TorrentStore.index
+
+    @staticmethod
+    def get(infohash: str) -> str | None:
+        """
+        Gets the path of a stored torrent file.
+        :param infohash: The Nyaa infohash of the torrent.
+        :return: The path of the stored torrent file. `None` if the torrent is not stored.
+        """
+
+        infohash = (infohash or "").lower()
+        if not _is_infohash(infohash):
+            return None
+
+        with TorrentStore.lock:
+            index = TorrentStore._get_index()
+            path = index.get(infohash)
+            if path and not os.path.exists(path):
+                del index[infohash]  # Removed from disk since indexing
+                path = None
+        return path
+
+    @staticmethod
+    def add(infohash: str, content: bytes) -> str | None:
+        """
+        Writes a torrent file to the store.
+        :param infohash: The Nyaa infohash of the torrent.
+        :param content: The contents of the torrent file.
+        :return: The path of the stored torrent file. `None` if the infohash is invalid.
+        """
+
+        infohash = (infohash or "").lower()
+        if not _is_infohash(infohash):
+            return None
+
+        with TorrentStore.lock:
+            index = TorrentStore._get_index()
+            path = os.path.join(TorrentStore.get_directory(), f"{infohash}.torrent")
+
+            with open(path + ".tmp", "wb") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+            index[infohash] = path
+        return path
+
+    @staticmethod
+    def link(source: str, destination: str) -> None:
+        """
+        Hardlinks a stored torrent file to a destination path, replacing any existing file.
+        Falls back to copying the file when the store and destination are on different filesystems.
+        :param source: The path of the stored torrent file.
+        :param destination: The path of the titled torrent file.
+        :return: None
+        """
+
+        if os.path.exists(destination) and os.path.samefile(source, destination):
+            return
+
+        temp_path = destination + ".tmp"
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
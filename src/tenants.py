@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+import requests
+from breaker import Breaker
+from requester import Requester
+
+
+_RESERVED_NAMES = (".store",)
+
+
+def _overlaps(path: str, other: str) -> bool:
+    path, other = os.path.abspath(path), os.path.abspath(other)
+    return os.path.commonpath([path, other]) in (path, other)
+
+
+class Tenant:
+
+    def __init__(self, watcher_dir: str, downloads_dir: str) -> None:
+        self.watcher_dir = os.path.abspath(watcher_dir.strip())
+        self.name = os.path.basename(self.watcher_dir.rstrip("/")) or self.watcher_dir
+        self.downloads_dir = os.path.join(downloads_dir, self.name)
+
+
+class Tenants:
+    """
+    Runs the watchers of several `/watcher` directories in one process, each with its own JSON files, history, cursors and webhooks.
+    Tenants are searched one at a time, and a feed fetched by one tenant is reused once by each other tenant until it expires.
+    """
+
+    tenants: list[Tenant] | None = None
+    current: Tenant | None = None
+    cache: dict[str, tuple[float, requests.Response, set[str]]] = {}
+    lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """
+        Checks if the `TENANT_DIRS` environment variable is set.
+        :return: `True` if the watcher runs in multi-tenant mode.
+        """
+
+        return len(Tenants.get_tenants()) > 0
+
+    @staticmethod
+    def get_tenants() -> list[Tenant]:
+        """
+        Gets the tenants from the `TENANT_DIRS` environment variable, parsing it on first use.
+        :return: A list of tenants, in the configured order. An empty list if the variable is not set.
+        :except Exception: If two directories have the same name, or a name is reserved or downloads into the torrent store.
+        """
+
+        if Tenants.tenants is None:
+            downloads_dir = os.environ.get("DOWNLOADS_DIR", "/downloads")
+            paths = [path for path in os.environ.get("TENANT_DIRS", "").split(",") if path.strip()]
+            tenants = [Tenant(path, downloads_dir) for path in paths]
+
+            names = [tenant.name for tenant in tenants]
+            duplicates = sorted({name for name in names if names.count(name) > 1})
+            if duplicates:
+                raise Exception(f"Tenant Error: The 'TENANT_DIRS' directory names must be unique ({', '.join(duplicates)} used more than once). "
+                                f"Rename the directories and restart the watcher.")
+
+            # Torrent files are stored once for every tenant, so no tenant can download into the store
+            store_dir = os.path.abspath(os.environ.get("TORRENT_STORE_DIR", downloads_dir + "/.store"))
+            reserved = sorted({tenant.name for tenant in tenants if tenant.name in _RESERVED_NAMES or _overlaps(tenant.downloads_dir, store_dir)})
+            if reserved:
+                raise Exception(f"Tenant Error: The 'TENANT_DIRS' directories named {', '.join(reserved)} use a reserved name or download into the torrent store ('{store_dir}'). "
+                                f"Rename the directories and restart the watcher.")
+            Tenants.tenants = tenants
+
+            if tenants:
+                os.environ.setdefault("TORRENT_STORE_DIR", store_dir)
+        return Tenants.tenants
+
+    @staticmethod
+    def get_cache_seconds() -> float:
+        """
+        Gets the `TENANT_CACHE_SEC` environment variable.
+        :return: The number of seconds a fetched feed is reused by the other tenants (Defaults to `60`). `0` disables the cache.
+        """
+
+        return max(0.0, float(os.environ.get("TENANT_CACHE_SEC", 60)))
+
+    @staticmethod
+    def activate(tenant: Tenant) -> None:
+        """
+        Points the JSON files and downloads to a tenant's directories, until another tenant is activated.
+        :param tenant: The tenant to activate.
+        :return: None
+        """
+
+        Tenants.current = tenant
+        Breaker.scope = tenant.name
+        os.environ["WATCHER_DIR"] = tenant.watcher_dir
+        os.environ["DOWNLOADS_DIR"] = tenant.downloads_dir
+        os.makedirs(tenant.downloads_dir, exist_ok=True)
+
+    @staticmethod
+    def get(url: str) -> requests.Response:
+        """
+        Fetches a feed with `Requester.get()`, reusing the response of another tenant that fetched the same URL within `TENANT_CACHE_SEC` seconds.
+        A tenant never reuses a response twice, so each of its checks sees a fresh feed.
+        :param url: The URL of the feed.
+        :return: The `requests.Response` object.
+        :except requests.RequestException: If the request fails or times out.
+        """
+
+        ttl = Tenants.get_cache_seconds()
+        if Tenants.current is None or ttl == 0:
+            return Requester.get(url)
+
+        name = Tenants.current.name
+        now = time.monotonic()
+        with Tenants.lock:
+            cached = Tenants.cache.get(url)
+            if cached is not None and now - cached[0] < ttl and name not in cached[2]:
+                cached[2].add(name)
+                return cached[1]
+
+        response = Requester.get(url)
+        if response.status_code == 200:
+            with Tenants.lock:
+                Tenants.cache = {key: value for key, value in Tenants.cache.items() if now - value[0] < ttl}
+                Tenants.cache[url] = (now, response, {name})
+        return response
@@ -0,0 +1,72 @@
+import re
+
+_GROUPS = re.compile(r"\[[^\]]*\]|\([^)]*\)|\{[^}]*\}")
+_RESOLUTION = re.compile(r"\b(\d{3,4})[pP]\b|\b\d{3,4}x(\d{3,4})\b")
+_SEASON_EPISODE = re.compile(r"\bS(\d{1,2})\s?E(\d{1,4})(?:v(\d+))?\b", re.IGNORECASE)
+_DASH_EPISODE = re.compile(r"\s-\s(\d{1,4})(?:v(\d+))?(?=\s|$|\.)")
+_SEASON = re.compile(r"\b(?:S(\d{1,2})|Season\s(\d{1,2})|(\d)(?:st|nd|rd|th)\sSeason)\b", re.IGNORECASE)
+_VERSION = re.compile(r"\bv(\d+)\b", re.IGNORECASE)
+
+
+def _normalize_series(series: str) -> str:
+    series = re.sub(r"[^0-9a-z]+", " ", series.lower())
+    return series.strip()
+
+
+def parse_title(title: str) -> dict | None:
+    """
+    Parses the series, season, episode, version and resolution from a torrent title.
+    Supports the `Series - 01v2 (1080p)` and `Series S01E01 [1080p]` formats.
+    :param title: The title of a torrent.
+    :return: A dictionary with the `series`, `season`, `episode`, `version` and `resolution` values.
+        `None` if the title has no series or episode number (E.g., batches).
+    """
+
+    match = _RESOLUTION.search(title)
+    resolution = f"{match.group(1) or match.group(2)}p" if match else None
+
+    name = _GROUPS.sub(" ", title)
+    name = re.sub(r"\.(mkv|mp4|avi)$", "", name.strip(), flags=re.IGNORECASE)
+
+    season = None
+    match = _SEASON_EPISODE.search(name)
+    if match:
+        series = name[:match.start()]
+        season, episode, version = int(match.group(1)), int(match.group(2)), match.group(3)
+    else:
+        match = _DASH_EPISODE.search(name)
+        if not match:
+            return None
+        series = name[:match.start()]
+        episode, version = int(match.group(1)), match.group(2)
+
+        season_match = _SEASON.search(series)
+        if season_match:
+            season = int(next(group for group in season_match.groups() if group))
+            series = series[:season_match.start()] + series[season_match.end():]
+
+    if not version:
+        version_match = _VERSION.search(name[match.end():])
+        version = version_match.group(1) if version_match else None
+
+    series = _normalize_series(series)
+    if not series:
+        return None
+
+    return {
+        "series": series,
+        "season": season or 1,
+        "episode": episode,
+        "version": int(version) if version else 1,
+        "resolution": resolution
+    }
+
+
+def get_episode_key(parsed: dict) -> tuple[str, int, int]:
+    """
+    Gets the key that identifies an episode across uploaders and re-releases.
+    :param parsed: A dictionary returned by `parse_title()`.
+    :return: A tuple of the series, season and episode.
+    """
+
+    return parsed.get('series'), parsed.get('season'), parsed.get('episode')
@@ -0,0 +1,94 @@
+import calendar
+from feedparser import FeedParserDict
+
+
+def get_published_time(entry: FeedParserDict) -> float | None:
+    """
+    Gets the publish time of a parsed RSS entry.
+    :param entry: A `FeedParserDict` entry from `feedparser.parse()`.
+    :return: The publish time as a Unix timestamp. `None` if the entry has no publish date.
+    """
+
+    published_parsed = entry.get('published_parsed')
+    return calendar.timegm(published_parsed) if published_parsed else None
+
+
+class Torrent:
+    """
+    A torrent entry from an RSS feed, with only the fields used to download, notify and record it.
+    """
+
+    __slots__ = (
+        "title", "id", "link", "published", "published_time", "nyaa_infohash", "nyaa_size", "nyaa_category",
+        "nyaa_downloads", "nyaa_seeders", "nyaa_leechers", "uploader", "watchlist", "webhooks", "priority", "download_datetime"
+    )
+
+    def __init__(self, title: str, id: str = None, link: str = None, published: str = "", published_time: float = None,
+                 nyaa_infohash: str = None, nyaa_size: str = "", nyaa_category: str = "", nyaa_downloads: str = "",
+                 nyaa_seeders: str = "", nyaa_leechers: str = "") -> None:
+        self.title = title
+        self.id = id
+        self.link = link
+        self.published = published
+        self.published_time = published_time
+        self.nyaa_infohash = nyaa_infohash
+        self.nyaa_size = nyaa_size
+        self.nyaa_category = nyaa_category
+        self.nyaa_downloads = nyaa_downloads
+        self.nyaa_seeders = nyaa_seeders
+        self.nyaa_leechers = nyaa_leechers
+        self.uploader: str | None = None
+        self.watchlist: str | None = None
+        self.webhooks: set[str] = set()
+        self.priority = 0
+        self.download_datetime: str | None = None
+
+    @staticmethod
+    def from_entry(entry: FeedParserDict) -> "Torrent":
+        """
+        Creates a torrent record from a parsed RSS entry.
+        :param entry: A `FeedParserDict` entry from `feedparser.parse()`.
+        :return: A `Torrent` object.
+        """
+
+        return Torrent(
+            title=entry.get('title', ""),
+            id=entry.get('id'),
+            link=entry.get('link'),
+            published=entry.get('published', ""),
+            published_time=get_published_time(entry),
+            nyaa_infohash=entry.get('nyaa_infohash'),
+            nyaa_size=entry.get('nyaa_size', ""),
+            nyaa_category=entry.get('nyaa_category', ""),
+            nyaa_downloads=entry.get('nyaa_downloads', ""),
+            nyaa_seeders=entry.get('nyaa_seeders', ""),
+            nyaa_leechers=entry.get('nyaa_leechers', "")
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Gets the fields of the torrent to store it in a JSON file until it is downloaded.
+        :return: A dictionary of the torrent's fields.
+        """
+
+        data = {field: getattr(self, field) for field in Torrent.__slots__ if field != "download_datetime"}
+        data['webhooks'] = sorted(self.webhooks)
+        return data
+
+    @staticmethod
+    def from_dict(data: dict) -> "Torrent":
+        """
+        Creates a torrent record from the fields stored by `to_dict()`.
+        :param data: A dictionary of the torrent's fields.
+        :return: A `Torrent` object.
+        """
+
+        torrent = Torrent(data.get('title', ""))
+        for field in Torrent.__slots__:
+            if field in data and field not in ("title", "webhooks"):
+                setattr(torrent, field, data.get(field))
+        torrent.webhooks = set(data.get('webhooks', []))
+        return torrent
+
+    def __repr__(self) -> str:
+        return f"Torrent(title={self.title!r}, nyaa_infohash={self.nyaa_infohash!r})"
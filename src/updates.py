@@ -3,6 +3,8 @@ import os
 import re
 from logger import Logger
 
+FILENAMES = ("config", "history", "subscriptions", "webhooks", "watchlist")
+
 
 def get_json_path(filename: str) -> str:
     """
@@ -15,52 +17,91 @@ def get_json_path(filename: str) -> str:
     return os.environ.get("WATCHER_DIR", "/watcher") + filepath
 
 
-def update_files(version: str) -> str:
-    version = update_to_v111(version)
-    version = update_to_v112(version)
-    version = update_to_v120(version)
-    version = update_to_v121(version)
-    return version
+def _read_documents() -> dict[str, dict | None]:
+    """
+    Reads every JSON file that a migration can change.
+    :return: A dictionary of the JSON files by name. Missing files are `None`.
+    :except json.decoder.JSONDecodeError: If a JSON file cannot be decoded.
+    """
+
+    docs = {}
+    for filename in FILENAMES:
+        path = get_json_path(filename)
+        if not os.path.exists(path):
+            docs[filename] = None
+            continue
+        try:
+            file = open(path, "r")
+            docs[filename] = json.loads(file.read())
+            file.close()
+        except json.decoder.JSONDecodeError as e:
+            raise json.decoder.JSONDecodeError(f"{filename}.json", e.doc, e.pos)
+    return docs
+
+
+def _write_documents(docs: dict[str, dict | None], original: dict[str, dict | None]) -> None:
+    """
+    Writes the JSON files changed by the migrations.
+    Every file is written to a temporary file first and then moved into place, with 'config.json' last,
+    so an interrupted update leaves 'config.json' at the previous version and is run again at the next startup.
+    :param docs: A dictionary of the migrated JSON files by name.
+    :param original: A dictionary of the JSON files by name before the migrations.
+    :return: None
+    """
 
+    changed = [filename for filename in FILENAMES if docs.get(filename) is not None and docs.get(filename) != original.get(filename)]
+    changed.sort(key=lambda filename: filename == "config")
 
-def update_to_v111(version: str) -> str:
+    for filename in changed:
+        file = open(get_json_path(filename) + ".tmp", "w")
+        file.write(json.dumps(docs[filename], indent=4))
+        file.close()
+    for filename in changed:
+        os.replace(get_json_path(filename) + ".tmp", get_json_path(filename))
+
+
+def update_files(version: str) -> str:
     """
-    Updates JSON files from v1.0.0/v1.0.1 to v1.1.1.
-    :return: Updated `version` param.
+    Updates the JSON files to the current version.
+    The files are read once, every migration after `version` is applied to them in memory, and the changed files are written once.
+    :param version: The version of the JSON files.
+    :return: The updated version.
     """
 
-    if version != "1.0.0" or version != "1.0.1":
+    if not any(version in versions for versions, _, _ in MIGRATIONS):
         return version
 
-    Logger.debug("Updating to v1.1.1...")
+    original = _read_documents()
+    docs = json.loads(json.dumps(original))  # Migrations change a copy, so only changed files are written
 
-    # Adding missing 'webhooks' property to 'watchlist.json'
-    try:
-        file = open(get_json_path("watchlist"), "r")
-        watchlist = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("watchlist.json", e.doc, e.pos)
+    for versions, new_version, migrate in MIGRATIONS:
+        if version not in versions:
+            continue
+        Logger.debug(f"Updating to v{new_version}...")
+        docs = migrate(docs)
+        version = new_version
+        Logger.log(f"Updated to v{new_version}.")
 
-    for entry in watchlist.get('watchlist'):
+    _write_documents(docs, original)
+    return version
+
+
+def update_to_v111(docs: dict[str, dict | None]) -> dict[str, dict | None]:
+    """
+    Updates JSON files from v1.0.0/v1.0.1 to v1.1.1.
+    :param docs: A dictionary of the JSON files by name.
+    :return: The updated `docs` param.
+    """
+
+    # Adding missing 'webhooks' property to 'watchlist.json'
+    for entry in (docs.get('watchlist') or {}).get('watchlist', []):
         if 'webhooks' not in entry:
             entry['webhooks'] = []
-            Logger.log(f"Added 'webhooks' property to watchlist entry: {entry.get('name')}.", {"level": "debug"})
-
-    file = open(get_json_path("watchlist"), "w")
-    file.write(json.dumps(watchlist, indent=4))
-    file.close()
+            Logger.debug(f"Added 'webhooks' property to watchlist entry: {entry.get('name')}.")
 
     # Adding sample webhook entry to 'webhooks.json', if empty
-    try:
-        file = open(get_json_path("webhooks"), "r")
-        webhooks = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("webhooks.json", e.doc, e.pos)
-
-    if len(webhooks.get('webhooks')) == 0:
-        new_webhook_json = {
+    if not (docs.get('webhooks') or {}).get('webhooks'):
+        docs['webhooks'] = {
             "webhooks": [
                 {
                     "name": "Example Webhook Name",
@@ -79,98 +120,52 @@ def update_to_v111(version: str) -> str:
             ]
         }
 
-        file = open(get_json_path("webhooks"), "w")
-        file.write(json.dumps(new_webhook_json, indent=4))
-        file.close()
-
-    Logger.log("Updated to v1.1.1.")
-    return "1.1.1"
+    docs['config'] = (docs.get('config') or {}) | {"version": "1.1.1"}
+    return docs
 
 
-def update_to_v112(version: str) -> str:
+def update_to_v112(docs: dict[str, dict | None]) -> dict[str, dict | None]:
     """
     Updates JSON files from v1.1.0/v1.1.1 to v1.1.2.
-    :return: Updated `version` param.
+    :param docs: A dictionary of the JSON files by name.
+    :return: The updated `docs` param.
     """
 
-    if version != "1.1.0" or version != "1.1.1":
-        return version
-
-    Logger.debug("Updating to v1.1.2...")
-
     # Adding 'errors' property and changing 'history' to 'downloads' in 'history.json'
-    try:
-        file = open(get_json_path("history"), "r")
-        history = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("history.json", e.doc, e.pos)
-
-    history = {
-        "downloads": history.get('history', []),
+    history = docs.get('history') or {}
+    docs['history'] = {
+        "downloads": history.get('downloads', history.get('history', [])),
         "errors": history.get('errors', [])
     }
 
-    file = open(get_json_path("history"), "w")
-    file.write(json.dumps(history, indent=4))
-    file.close()
-
     # Change value name and adding 'version' property in 'config.json'
-    try:
-        file = open(get_json_path("config"), "r")
-        config = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("config.json", e.doc, e.pos)
-
-    config = {
+    config = docs.get('config') or {}
+    docs['config'] = {
         "nyaa_rss": config.get('nyaa_rss', "https://nyaa.si/?page=rss&u=NYAA_USERNAME"),
-        "interval_sec": config.get('watcher_interval_seconds', 600),
+        "interval_sec": config.get('interval_sec', config.get('watcher_interval_seconds', 600)),
         "version": "1.1.2"
     }
+    return docs
 
-    file = open(get_json_path("config"), "w")
-    file.write(json.dumps(config, indent=4))
-    file.close()
 
-    Logger.log("Updated to v1.1.2.")
-    return "1.1.2"
-
-
-def update_to_v120(version: str) -> str:
+def update_to_v120(docs: dict[str, dict | None]) -> dict[str, dict | None]:
     """
     Updates JSON files from v1.1.2 to v1.2.0.
-    :return: Updated `version` param.
+    :param docs: A dictionary of the JSON files by name.
+    :return: The updated `docs` param.
     """
 
-    if version != "1.1.2":
-        return version
-
-    Logger.debug("Updating to v1.2.0...")
-
-    # Get values and update the 'version' value in 'config.json'
-    try:
-        file = open(get_json_path("config"), "r")
-        config = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("config.json", e.doc, e.pos)
-
-    interval = config.get('watcher_interval_seconds', 600)
+    # Get values from 'config.json'
+    config = docs.get('config') or {}
+    interval = config.get('interval_sec', config.get('watcher_interval_seconds', 600))
     rss = config.get('nyaa_rss', "https://nyaa.si/?page=rss&u=USERNAME")
 
     # Update 'watchlist.json' and switch to 'subscriptions.json'
-    try:
-        file = open(get_json_path("watchlist"), "r")
-        watchlist = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("watchlist.json", e.doc, e.pos)
-
-    username = re.search(r"u=[^&]*", rss).group().replace(r"u=", "")
+    match = re.search(r"u=([^&]*)", rss)
+    username = match.group(1) if match and match.group(1) else "USERNAME"
 
     new_watchlist = []
-    for entry in watchlist.get('watchlist'):
+    for entry in (docs.get('watchlist') or {}).get('watchlist', []):
         new_watchlist.append({
             "name": entry.get('name'),
             "tags": entry.get('tags', []),
@@ -179,7 +174,7 @@ def update_to_v120(version: str) -> str:
             "webhooks": entry.get('webhooks', [])
         })
 
-    subscriptions = {
+    docs['subscriptions'] = {
         "interval_sec": interval,
         "subscriptions": [
             {
@@ -191,20 +186,10 @@ def update_to_v120(version: str) -> str:
         ]
     }
 
-    file = open(get_json_path("subscriptions"), "w")
-    file.write(json.dumps(subscriptions, indent=4))
-    file.close()
-
     # Adding 'uploader' property to 'history.json'
-    try:
-        file = open(get_json_path("history"), "r")
-        history = json.loads(file.read())
-        file.close()
-    except json.decoder.JSONDecodeError as e:
-        raise json.decoder.JSONDecodeError("history.json", e.doc, e.pos)
-
+    history = docs.get('history') or {}
     new_history = []
-    for entry in history.get('downloads'):
+    for entry in history.get('downloads', []):
         new_history.append({
             "uploader": entry.get('uploader', username),
             "torrent_title": entry.get('torrent_title'),
@@ -212,43 +197,29 @@ def update_to_v120(version: str) -> str:
             "nyaa_page": entry.get('nyaa_page'),
             "nyaa_hash": entry.get('nyaa_hash')
         })
-
-    file = open(get_json_path("history"), "w")
-    file.write(json.dumps(new_history, indent=4))
-    file.close()
+    docs['history'] = {"downloads": new_history, "errors": history.get('errors', [])}
 
     # Update 'version' value in 'config.json'
-    config = {
-        "version": "1.2.0"
-    }
+    docs['config'] = {"version": "1.2.0"}
+    return docs
 
-    file = open(get_json_path("config"), "w")
-    file.write(json.dumps(config, indent=4))
-    file.close()
 
-    Logger.log("Updated to v1.2.0.")
-    return "1.2.0"
-
-
-def update_to_v121(version: str) -> str:
+def update_to_v121(docs: dict[str, dict | None]) -> dict[str, dict | None]:
+    """
+    Updates JSON files from v1.2.0 to v1.2.1.
+    :param docs: A dictionary of the JSON files by name.
+    :return: The updated `docs` param.
     """
-        Updates JSON files from v1.2.0 to v1.2.1.
-        :return: Updated `version` param.
-        """
-
-    if version != "1.2.0":
-        return version
-
-    Logger.debug("Updating to v1.2.1...")
 
     # Update 'version' value in 'config.json'
-    config = {
-        "version": "1.2.1"
-    }
+    docs['config'] = {"version": "1.2.1"}
+    return docs
 
-    file = open(get_json_path("config"), "w")
-    file.write(json.dumps(config, indent=4))
-    file.close()
 
-    Logger.log("Updated to v1.2.1.")
-    return "1.2.1"
+# Each migration updates the JSON files from any of its versions to its new version, in order
+MIGRATIONS = [
+    (("1.0.0", "1.0.1"), "1.1.1", update_to_v111),
+    (("1.1.0", "1.1.1"), "1.1.2", update_to_v112),
+    (("1.1.2",), "1.2.0", update_to_v120),
+    (("1.2.0",), "1.2.1", update_to_v121)
+]
@@ -1,21 +1,114 @@
 import feedparser
+import hashlib
 import os
 import re
+import time
+from breaker import Breaker
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from feedparser import FeedParserDict
 from logger import Logger
+from matcher import Matcher
+from requester import DeadlineExceeded, Requester
+from shard import Shard
+from tenants import Tenants
+from titles import get_episode_key, parse_title
+from torrent import Torrent, get_published_time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+RECENT_HASHES = 20  # Number of recent torrent hashes kept in each subscription's cursor
+_VOLATILE_FIELDS = re.compile(rb"<(lastBuildDate|pubDate)>[^<]*</(lastBuildDate|pubDate)>")
+_ITEM_IDENTITIES = re.compile(rb"<(?:guid|nyaa:infoHash)\b[^>]*>([^<]*)<")
 
-def _sort_torrents(torrents: list) -> list:
+
+def get_priority_key(torrent: Torrent) -> tuple[int, float]:
+    """
+    Gets the download order of a torrent.
+    :param torrent: A `Torrent` object.
+    :return: A tuple that sorts torrents by their `priority` value in descending order, then by their publish time in ascending order.
+    """
+
+    return -torrent.priority, torrent.published_time or 0.0
+
+
+def _sort_torrents(torrents: list[Torrent]) -> list[Torrent]:
+    """
+    Sorts a list of torrents in download order.
+    :param torrents: A list of `Torrent` objects.
+    :return: A list of sorted `Torrent` objects, ordered by their `priority` value in descending order, then by their publish time and `title` value in ascending order.
+    """
+
+    return sorted(torrents, key=lambda torrent: (get_priority_key(torrent), torrent.title))
+
+
+def _get_page_url(rss: str, page: int) -> str:
+    """
+    Gets the URL of a page of an RSS feed.
+    :param rss: The URL of the RSS feed (E.g., https://nyaa.si/?page=rss&u=Username).
+    :param page: The page number, starting at `1`.
+    :return: The URL of the RSS feed with the `p` query parameter set to the page number.
+    """
+
+    parts = urlsplit(rss)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != "p"]
+    return urlunsplit(parts._replace(query=urlencode(query + [("p", str(page))])))
+
+
+def _fetch_page(url: str) -> list[FeedParserDict]:
+    """
+    Fetches a page of an RSS feed.
+    :param url: The URL of the page.
+    :return: A list of parsed RSS entries.
+    :except Exception: If the page cannot be fetched.
+    """
+
+    response = Tenants.get(url)
+    if response.status_code != 200:
+        raise Exception(f"{url} responded with HTTP Status Code: {response.status_code}.")
+    return feedparser.parse(response.content, response_headers=dict(response.headers)).entries
+
+
+def get_cursor(entries: list[FeedParserDict], recent_hashes: list[str]) -> tuple[str, int | None, list[str]]:
+    """
+    Gets the cursor of a subscription after a fetch.
+    :param entries: The parsed RSS entries of the fetch, newest first.
+    :param recent_hashes: The `recent_hashes` property from a `subscriptions` entry.
+    :return: A tuple of the newest torrent hash, the newest publish time (as a Unix timestamp),
+        and the most recent torrent hashes (at most `RECENT_HASHES` hashes).
+    """
+
+    hashes = [entry.get('nyaa_infohash') for entry in entries[:RECENT_HASHES] if entry.get('nyaa_infohash')]
+    hashes += [torrent_hash for torrent_hash in recent_hashes if torrent_hash not in hashes]
+    published = [get_published_time(entry) for entry in entries[:RECENT_HASHES]]
+    published = [time_value for time_value in published if time_value is not None]
+    return entries[0].get('nyaa_infohash', ""), int(max(published)) if published else None, hashes[:RECENT_HASHES]
+
+
+def get_feed_digest(body: bytes) -> str:
+    """
+    Gets the digest of an RSS feed's body from the identities (`guid` and `nyaa:infoHash`) of its items, in order.
+    The seeders, leechers and downloads of each item and the feed's `lastBuildDate` change between requests, so they are not part of the digest.
+    :param body: The raw body of an RSS feed response.
+    :return: The SHA-256 hex digest of the feed.
     """
-    Sorts a list of torrents based on their titles.
-    :param torrents: A list of dictionaries, each representing an RSS torrent entry.
-    :return: A list of sorted torrent dictionaries, ordered by their 'title' key in ascending order.
+
+    identities = _ITEM_IDENTITIES.findall(body)
+    if identities:
+        return hashlib.sha256(b"\n".join(identities)).hexdigest()
+
+    # Feeds without item identities are compared by their body; only the channel fields before the first item are volatile
+    position = body.find(b"<item")
+    head, items = (body[:position], body[position:]) if position >= 0 else (body, b"")
+    return hashlib.sha256(_VOLATILE_FIELDS.sub(b"", head) + items).hexdigest()
+
+
+def get_backfill_pages() -> int:
+    """
+    Gets the `BACKFILL_MAX_PAGES` environment variable.
+    :return: The maximum number of extra RSS pages fetched when the previous torrent is not on the first page (Defaults to `5`). `0` disables backfilling.
     """
 
-    torrent_titles = [(torrent['title'], torrent) for torrent in torrents]
-    torrent_titles.sort()
-    return [pair[1] for pair in torrent_titles]
+    return max(0, int(os.environ.get("BACKFILL_MAX_PAGES", 5)))
 
 
 class Watcher:
@@ -23,11 +116,63 @@ class Watcher:
     def __init__(self, subscriptions_json: dict, history_json: dict) -> None:
         self.subscriptions = subscriptions_json
         self.history = history_json
+        self.matchers: dict[str, Matcher] = {}
+        self.episodes: dict[tuple, list[dict]] | None = None
+        self.queued: dict[tuple, list[dict]] = {}
+        self.pending: list[tuple[Torrent, dict]] = []
+        self.digests: dict[str, str] = {}
+        self.deferred: list[Torrent] = []
+        self.deferred_subs: set[str] = set()
+        self.saved_waiting: dict[str, dict] | None = None
+
+        for sub in self.subscriptions.get("subscriptions", []):
+            self.get_matcher(sub.get('username'), sub.get('watchlist', []))
+        self.load_waiting()
+
+    def load_waiting(self) -> None:
+        """
+        Restores the torrents that are waiting for a preferred resolution and the downloads deferred by the deadline
+        from the `pending` and `deferred` properties of the subscriptions searched by this worker.
+        :return: None
+        """
+
+        sharded = Shard.is_enabled()
+        subscriptions = [sub for sub in self.subscriptions.get("subscriptions", []) if not sharded or Shard.owns(sub)]
+        self.pending = [(Torrent.from_dict(entry.get('torrent', {})), entry.get('dedupe')) for sub in subscriptions for entry in sub.get('pending', [])]
+        self.deferred = [Torrent.from_dict(entry) for sub in subscriptions for entry in sub.get('deferred', [])]
+        self.saved_waiting = self.get_waiting()
 
-    def append_to_history(self, torrents: list[dict]) -> None:
+    def get_waiting(self) -> dict[str, dict]:
+        """
+        Gets the torrents that are waiting to be downloaded, to store them in the subscriptions searched by this worker.
+        :return: A dictionary of subscription names and dictionaries of their `pending` and `deferred` entries.
+        """
+
+        sharded = Shard.is_enabled()
+        waiting = {sub.get('username'): {"pending": [], "deferred": []} for sub in self.subscriptions.get("subscriptions", []) if not sharded or Shard.owns(sub)}
+        for torrent, policy in self.pending:
+            if torrent.uploader in waiting:
+                waiting[torrent.uploader]['pending'].append({"torrent": torrent.to_dict(), "dedupe": policy})
+        for torrent in self.deferred:
+            if torrent.uploader in waiting:
+                waiting[torrent.uploader]['deferred'].append(torrent.to_dict())
+        return waiting
+
+    def save_waiting(self) -> None:
+        """
+        Writes the torrents that are waiting to be downloaded to 'subscriptions.json', if they changed since the previous write.
+        :return: None
+        """
+
+        waiting = self.get_waiting()
+        if waiting != self.saved_waiting:
+            Config.set_waiting(waiting)
+            self.saved_waiting = waiting
+
+    def append_to_history(self, torrents: list[Torrent]) -> None:
         """
         Appends a list of torrents to the history.
-        :param torrents: A list of dictionaries, each representing a torrent. Each dictionary must have the following keys:
+        :param torrents: A list of `Torrent` objects, each with the following values:
                 'uploader': The name of the uploader.
                 'title': The title of the torrent.
                 'download_datetime': The date and time when the torrent was downloaded.
@@ -40,74 +185,260 @@ class Watcher:
 
         for torrent in torrents:
             downloads.append({
-                "uploader": torrent.get('uploader'),
-                "torrent_title": torrent.get('title'),
-                "date_downloaded": torrent.get('download_datetime'),
-                "nyaa_page": torrent.get('id'),
-                "nyaa_hash": torrent.get('nyaa_infohash')
+                "uploader": torrent.uploader,
+                "torrent_title": torrent.title,
+                "date_downloaded": torrent.download_datetime,
+                "nyaa_page": torrent.id,
+                "nyaa_hash": torrent.nyaa_infohash
             })
 
-    def fetch_feed(self, rss: str, sub_name: str, prev_hash: str = None, watchlist: list[dict] = None, sub_webhooks: list[str] = None) -> list:
+    def get_episodes(self) -> dict[tuple, list[dict]]:
+        """
+        Gets the parsed episodes of all downloaded torrents, parsing the history on first use.
+        :return: A dictionary of episode keys and lists of parsed titles.
+        """
+
+        if self.episodes is None:
+            self.episodes = {}
+            for entry in self.history.get('downloads'):
+                self.record_episode(entry.get('torrent_title', ""))
+        return self.episodes
+
+    def record_episode(self, title: str) -> None:
+        """
+        Records the episode of a downloaded torrent.
+        :param title: The title of the torrent.
+        :return: None
+        """
+
+        parsed = parse_title(title)
+        if parsed:
+            self.get_episodes().setdefault(get_episode_key(parsed), []).append(parsed)
+
+    def queue_episode(self, title: str) -> None:
+        """
+        Records the episode of a torrent queued for download in the current search, so other copies of the episode are not queued with it.
+        Queued episodes are cleared by `finish_episodes()`, and only the downloaded ones are recorded.
+        :param title: The title of the torrent.
+        :return: None
+        """
+
+        parsed = parse_title(title)
+        if parsed:
+            self.queued.setdefault(get_episode_key(parsed), []).append(parsed)
+
+    def finish_episodes(self, torrents: list[Torrent]) -> None:
+        """
+        Records the episodes of the torrents downloaded in the current search and clears the queued episodes.
+        Episodes of torrents that failed to download are not recorded, so another copy can be downloaded in a later search.
+        :param torrents: A list of successfully downloaded `Torrent` objects.
+        :return: None
+        """
+
+        for torrent in torrents:
+            self.record_episode(torrent.title)
+        self.queued = {}
+
+    def check_episode(self, torrent: Torrent, policy: dict = None) -> str:
+        """
+        Checks a matched torrent against the downloaded episodes and the episodes queued in the current search with a watchlist's `dedupe` policy.
+        The `first` policy keeps the first copy of an episode, `version` keeps higher versions (E.g., `v2` re-releases),
+        and `resolution` keeps the first copy in the preferred resolution, waiting up to `window_min` minutes after upload for it before keeping any other resolution.
+        :param torrent: A matched `Torrent` object.
+        :param policy: The `dedupe` property of a watchlist entry (Defaults to `None`).
+        :return: `download` to queue the torrent, `skip` if the episode was already downloaded, or `defer` to wait for the preferred resolution.
+        """
+
+        parsed = parse_title(torrent.title)
+        if not policy or not parsed:
+            return "download"
+
+        key = get_episode_key(parsed)
+        existing = self.get_episodes().get(key, []) + self.queued.get(key, [])
+        name = policy.get('policy', "first")
+
+        if name == "version":
+            return "skip" if any(episode.get('version') >= parsed.get('version') for episode in existing) else "download"
+
+        if name == "resolution":
+            preferred = policy.get('resolution', "1080p").lower()
+            if any(episode.get('resolution') == preferred for episode in existing):
+                return "skip"
+            if parsed.get('resolution') == preferred:
+                return "download"
+            if existing:
+                return "skip"
+
+            published = torrent.published_time or time.time()
+            if time.time() - published < float(policy.get('window_min', 60)) * 60:
+                return "defer"
+            return "download"
+
+        return "skip" if existing else "download"
+
+    def release_pending(self) -> list[Torrent]:
+        """
+        Re-checks the torrents that are waiting for a preferred resolution.
+        :return: A list of torrents to download, whose waiting window has passed without a preferred resolution upload.
+        """
+
+        released, pending = [], []
+        for torrent, policy in self.pending:
+            decision = self.check_episode(torrent, policy)
+            if decision == "defer":
+                pending.append((torrent, policy))
+            elif decision == "download":
+                Logger.debug(f"Released waiting torrent: {torrent.title}")
+                self.queue_episode(torrent.title)
+                released.append(torrent)
+            else:
+                Logger.debug(f"Dropped waiting torrent for a preferred resolution: {torrent.title}")
+        self.pending = pending
+        return released
+
+    def get_matcher(self, sub_name: str, watchlist: list[dict]) -> Matcher:
+        """
+        Gets the matcher of a subscription's watchlist, building it when the watchlist has not been indexed yet.
+        :param sub_name: The `username` property from a `subscriptions` entry.
+        :param watchlist: The `watchlist` property from a `subscriptions` entry.
+        :return: A `Matcher` object for the watchlist.
+        """
+
+        matcher = self.matchers.get(sub_name)
+        if matcher is None or matcher.watchlist is not watchlist:
+            matcher = self.matchers[sub_name] = Matcher(watchlist)
+        return matcher
+
+    def backfill(self, rss: str, is_cursor, entries: list[FeedParserDict]) -> list[FeedParserDict]:
+        """
+        Fetches the older pages of an RSS feed when more torrents were uploaded since the previous fetch than the first page holds.
+        Pages are fetched concurrently, in groups of `REQUEST_POOL_SIZE` pages, until a group contains the previous torrent or `BACKFILL_MAX_PAGES` pages have been fetched.
+        :param rss: The URL of the RSS feed.
+        :param is_cursor: A function that returns `True` for a parsed RSS entry that was seen by the previous fetch.
+        :param entries: The parsed RSS entries of the first page.
+        :return: A list of the parsed RSS entries of every fetched page, newest first, without duplicates.
+        """
+
+        max_pages = get_backfill_pages()
+        workers = max(1, int(os.environ.get("REQUEST_POOL_SIZE", 4)))
+        pages = [entries]
+        page, last_page = 1, max_pages + 1
+
+        Logger.log(f" - The previous upload is not on the first page. Backfilling up to {max_pages} more page{'' if max_pages == 1 else 's'}...", {"fields": {"phase": "backfill"}})
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as executor:
+            while page < last_page:
+                numbers = list(range(page + 1, min(page + workers, last_page) + 1))
+                page = numbers[-1]
+                try:
+                    group = list(executor.map(_fetch_page, [_get_page_url(rss, number) for number in numbers]))
+                except Exception as e:
+                    if Requester.is_expired():
+                        raise DeadlineExceeded(f"The deadline of the current search has passed while backfilling {rss}.") from e
+                    Logger.log(f" - Connection Error: Cannot backfill {rss}.", {"fields": {"phase": "backfill"}})
+                    Logger.debug(f"{e}", {"exc_info": True})
+                    break
+
+                pages += group
+                if any(is_cursor(entry) for page_entries in group for entry in page_entries) or any(len(page_entries) == 0 for page_entries in group):
+                    break
+            else:
+                Logger.log(f" - The previous upload was not found in {page} pages. Older uploads may have been missed.", {"fields": {"phase": "backfill"}})
+
+        # Pages shift while new torrents are uploaded, so an entry can appear on two pages
+        merged, seen = [], set()
+        for page_entries in pages:
+            for entry in page_entries:
+                torrent_hash = entry.get('nyaa_infohash')
+                if torrent_hash not in seen:
+                    seen.add(torrent_hash)
+                    merged.append(entry)
+        Logger.debug(f"Backfilled {len(merged) - len(entries)} uploads from {len(pages) - 1} pages.")
+        return merged
+
+    def fetch_feed(self, rss: str, sub_name: str, prev_hash: str = None, watchlist: list[dict] = None, sub_webhooks: list[str] = None,
+                   prev_published: int = None, recent_hashes: list[str] = None, priority: int = 0) -> list[Torrent]:
         """
         Fetches an RSS feed and filters the torrents based on the watchlist.
+        The feed is read until a torrent from the previous fetch is found: a torrent with one of the recent hashes,
+        or a torrent published before the previous watermark, so the scan stops even if the previous torrent was removed from Nyaa.
         :param rss: The URL of the RSS feed (E.g., https://nyaa.si/?page=rss&u=Username).
         :param watchlist: The `watchlist` property from a `subscriptions` entry.
         :param sub_name: The `username` property from a `subscriptions` entry.
         :param prev_hash: The most recent torrent hash of the previous fetch. The `previous_hash` property from a `subscriptions` entry.
-        :return: A list of dictionaries, containing matched torrents fetched from the `rss` param.
+        :param prev_published: The newest publish time (as a Unix timestamp) of the previous fetch. The `previous_published` property from a `subscriptions` entry (Defaults to `None`).
+        :param recent_hashes: The most recent torrent hashes of the previous fetches. The `recent_hashes` property from a `subscriptions` entry (Defaults to `None`).
+        :param priority: The download priority of the subscription's torrents, unless a watchlist entry has its own. The `priority` property from a `subscriptions` entry (Defaults to `0`).
+        :return: A list of `Torrent` objects, containing matched torrents fetched from the `rss` param.
         """
 
         # log_entries: bool = os.environ.get("LOG_RSS_ENTRIES", "false").lower() == "true"
-        feed: FeedParserDict = feedparser.parse(rss)
+        try:
+            response = Tenants.get(rss)
+        except Exception as e:
+            if Requester.is_expired():
+                raise DeadlineExceeded(f"The deadline of the current search has passed while fetching {rss}.") from e
+            Logger.log(f"Connection Error: Cannot fetch {rss}.", {"fields": {"subscription": sub_name, "phase": "fetch"}})
+            Logger.debug(f"{e}", {"exc_info": True})
+            Breaker.failed(sub_name)
+            return []
+
+        if response.status_code != 200:
+            Logger.log(f"HTTP Error: {rss} responded with HTTP Status Code: {response.status_code}.", {"fields": {"subscription": sub_name, "phase": "fetch"}})
+            Breaker.failed(sub_name)
+            return []
+
+        # Some mirrors and proxies ignore conditional requests, so an unchanged body is detected by its digest
+        digest = get_feed_digest(response.content)
+        if self.digests.get(rss) == digest:
+            Logger.log(" - No changes since the previous fetch.", {"fields": {"subscription": sub_name, "phase": "fetch"}})
+            Breaker.succeeded(sub_name)
+            return []
+
+        feed: FeedParserDict = feedparser.parse(response.content, response_headers=dict(response.headers))
 
         if len(feed.entries) == 0:
-            Logger.log(f"Unknown Error: No uploads from {rss}.")
+            Logger.log(f"Unknown Error: No uploads from {rss}.", {"fields": {"subscription": sub_name, "phase": "fetch"}})
+            Breaker.failed(sub_name)
             return []
 
+        seen_hashes = set(recent_hashes or [])
+        if prev_hash:
+            seen_hashes.add(prev_hash)
+
+        def is_cursor(entry: FeedParserDict) -> bool:
+            if entry.get('nyaa_infohash') in seen_hashes:
+                return True
+            published = get_published_time(entry)
+            return prev_published is not None and published is not None and published < prev_published
+
+        entries: list[FeedParserDict] = feed.entries
+        if seen_hashes and get_backfill_pages() > 0 and not any(is_cursor(entry) for entry in entries):
+            entries = self.backfill(rss, is_cursor, entries)
+
         all_webhooks: list[str] = sub_webhooks or []
         download_queue = []
+        matcher = self.get_matcher(sub_name, watchlist or [])
 
-        for torrent in feed.entries:
-            title: str = torrent.get('title')
-            torrent_hash: str = torrent.get('nyaa_infohash')
+        for entry in entries:
+            title: str = entry.get('title')
+            torrent_hash: str = entry.get('nyaa_infohash')
 
             # Check if the torrent file has fetched previously
-            if torrent_hash == prev_hash:
+            if is_cursor(entry):
                 Logger.debug(f"Found previously fetched torrent: {title}")
                 break
 
             Logger.debug(f"Reading: {title}")
 
             if watchlist and len(watchlist) > 0:
-                for watchlist_entry in watchlist:
-                    tag_match = regex_match = ex_regex_match = hash_match = False
-
-                    # Checking tags
-                    tags: list[str] = watchlist_entry.get("tags", [])
-                    for tag in tags:
-                        if tag.lower() in title.lower():
-                            tag_match = True
-                            break
-
-                    # Checking regex
-                    regexes: list[str] = watchlist_entry.get("regex", [])
-                    for regex_pattern in regexes:
-                        pattern = re.compile(regex_pattern)
-                        if re.search(pattern, title):
-                            regex_match = True
-                            break
-
-                    # Checking excluded regex
-                    ex_regexes: list[str] = watchlist_entry.get("exclude_regex", [])
-                    for regex_pattern in ex_regexes:
-                        pattern = re.compile(regex_pattern)
-                        if re.search(pattern, title):
-                            ex_regex_match = True
-                            break
-
-                    match: bool = (tag_match or not tags) and (regex_match or not regexes)
-                    if ex_regex_match:
-                        match = False
+                lower_title = title.lower()
+                candidates = matcher.candidates(lower_title)
+                Logger.debug(f"Evaluating {len(candidates)} of {len(matcher.rules)} watchlist entries.")
+
+                for rule in candidates:
+                    result = rule.evaluate(title, lower_title)
+                    match: bool = result.get('match')
+                    hash_match = False
 
                     # Checking if torrent has been downloaded
                     if match:
@@ -115,23 +446,33 @@ class Watcher:
                         hash_match = len(history_entry) > 0
 
                     Logger.debug(
-                        f"Watchlist: {watchlist_entry.get('name', 'Unknown Watchlist')}\n"
-                        f" - Tags     (Match={tag_match}): {tags}\n"
-                        f" - RegEx    (Match={regex_match}): {regexes}\n"
-                        f" - Ex.RegEx (Match={ex_regex_match}): {ex_regexes}\n"
+                        f"Watchlist: {rule.entry.get('name', 'Unknown Watchlist')}\n"
+                        f" - Tags     (Match={result.get('tag_match')}): {rule.tags}\n"
+                        f" - RegEx    (Match={result.get('regex_match')}): {rule.regexes}\n"
+                        f" - Ex.RegEx (Match={result.get('ex_regex_match')}): {rule.ex_regexes}\n"
                         f" - History  (Match={hash_match}): {torrent_hash}"
                     )
-                    if watchlist_entry == watchlist[-1]:
+                    if rule == candidates[-1]:
                         Logger.debug()
 
                     # Add to queue if not already downloaded
-                    if match and not hash_match and not ex_regex_match:
-                        torrent['uploader'] = sub_name
-                        torrent['watchlist'] = watchlist_entry.get('name', "Unknown Watchlist")
-                        torrent['webhooks'] = set(all_webhooks + watchlist_entry.get("webhooks", []))
-                        download_queue.append(torrent)
-
-                        Logger.debug("Torrent added to download queue.")
+                    if match and not hash_match:
+                        torrent = Torrent.from_entry(entry)
+                        torrent.uploader = sub_name
+                        torrent.watchlist = rule.entry.get('name', "Unknown Watchlist")
+                        torrent.webhooks = set(all_webhooks + rule.entry.get("webhooks", []))
+                        torrent.priority = rule.entry.get('priority', priority)
+
+                        decision = self.check_episode(torrent, rule.entry.get('dedupe'))
+                        if decision == "download":
+                            self.queue_episode(title)
+                            download_queue.append(torrent)
+                            Logger.debug("Torrent added to download queue.")
+                        elif decision == "defer":
+                            self.pending.append((torrent, rule.entry.get('dedupe')))
+                            Logger.debug("Torrent is waiting for a preferred resolution upload.")
+                        else:
+                            Logger.debug("Torrent skipped; the episode has already been downloaded.")
                         break
 
             # No `watchlist` property
@@ -143,31 +484,90 @@ class Watcher:
                 Logger.debug(f" - History (Match={hash_match}): {torrent_hash}")
 
                 if not hash_match:
-                    torrent['uploader'] = sub_name
-                    torrent['webhooks'] = set(all_webhooks)
+                    torrent = Torrent.from_entry(entry)
+                    torrent.uploader = sub_name
+                    torrent.webhooks = set(all_webhooks)
+                    torrent.priority = priority
+                    self.queue_episode(title)
                     download_queue.append(torrent)
 
                     Logger.debug("Torrent added to download queue.")
 
-        Config.set_previous_hash(sub_name, feed.entries[0].get('nyaa_infohash', ""))
-        self.set_previous_hash(sub_name, feed.entries[0].get('nyaa_infohash', ""))
+        # Torrents waiting for a preferred resolution are stored with the cursor, which moves past them
+        cursor = get_cursor(entries, recent_hashes or [])
+        Config.set_cursor(sub_name, *cursor, pending=self.get_waiting().get(sub_name, {}).get('pending'))
+        self.set_cursor(sub_name, *cursor)
+        self.digests[rss] = digest
+        Breaker.succeeded(sub_name)
         return _sort_torrents(download_queue)
 
-    def fetch_all_feeds(self) -> list:
+    def fetch_all_feeds(self, callback=None) -> list[Torrent]:
         """
         Fetches all RSS feeds from the subscriptions and filters the torrents based on the watchlist.
-        :return: A list of dictionaries, containing matched torrents fetched from all subscriptions.
+        :param callback: A function called with the matched torrents of each subscription as soon as its feed is filtered,
+            so they can be downloaded while the other feeds are fetched (Defaults to `None`).
+        :return: A list of `Torrent` objects, containing matched torrents fetched from all subscriptions.
         """
 
         queue = []
         Logger.log()
-        for sub in self.subscriptions.get("subscriptions"):
-            Logger.log(f"Searching for new uploads from '{sub.get('username')}'...")
-            queue += self.fetch_feed(sub.get('rss'), sub.get('username'), sub.get('previous_hash'), sub.get('watchlist', []), sub.get('webhooks', []))
+
+        sharded = Shard.is_enabled()
+        if sharded and Shard.refresh():
+            # Subscriptions may have moved from other workers, so their cursors and downloads are reloaded
+            self.subscriptions = Config.get_subscriptions()
+            self.history = Config.get_history()
+            self.episodes = None
+            self.digests = {}
+            self.load_waiting()
+
+        # Subscriptions deferred by the previous search's deadline are searched first
+        subscriptions = sorted(self.subscriptions.get("subscriptions"), key=lambda sub: sub.get('username') not in self.deferred_subs)
+        self.deferred_subs = set()
+
+        for position, sub in enumerate(subscriptions):
+            if sharded and not Shard.owns(sub):
+                continue
+            if Requester.is_expired():
+                self.defer_subscriptions(subscriptions[position:])
+                break
+            if not Breaker.allow(sub.get('username')):
+                continue
+            Logger.log(f"Searching for new uploads from '{sub.get('username')}'...", {"fields": {"subscription": sub.get('username'), "phase": "fetch"}})
+            try:
+                torrents = self.fetch_feed(sub.get('rss'), sub.get('username'), sub.get('previous_hash'), sub.get('watchlist', []), sub.get('webhooks', []),
+                                           sub.get('previous_published'), sub.get('recent_hashes', []), sub.get('priority', 0))
+            except DeadlineExceeded as e:
+                Logger.debug(f"{e}")
+                self.defer_subscriptions(subscriptions[position:])
+                break
+            if callback and torrents:
+                callback(torrents)
+            queue += torrents
+
+        if self.pending:
+            torrents = _sort_torrents(self.release_pending())
+            if callback and torrents:
+                callback(torrents)
+            queue += torrents
         return queue
 
-    def set_previous_hash(self, sub_name: str, hash_value: str) -> None:
+    def defer_subscriptions(self, subscriptions: list[dict]) -> None:
+        """
+        Defers subscriptions that were not searched before the deadline to the next search.
+        :param subscriptions: A list of `subscriptions` entries.
+        :return: None
+        """
+
+        sharded = Shard.is_enabled()
+        self.deferred_subs = {sub.get('username') for sub in subscriptions if not sharded or Shard.owns(sub)}
+        Logger.log(f"Deadline: {len(self.deferred_subs)} subscription{'' if len(self.deferred_subs) == 1 else 's'} deferred to the next search.")
+
+    def set_cursor(self, sub_name: str, hash_value: str, published: int | None, recent_hashes: list[str]) -> None:
         for sub in self.subscriptions.get("subscriptions"):
             if sub.get('username') == sub_name:
                 sub['previous_hash'] = hash_value or sub['previous_hash']
+                if published is not None:
+                    sub['previous_published'] = max(published, sub.get('previous_published') or 0)
+                sub['recent_hashes'] = recent_hashes
                 break
@@ -2,14 +2,16 @@ import discord
 import os
 import re
 from logger import Logger
+from requester import Requester
+from torrent import Torrent
 
 
-def _apply_fields(webhook_json: dict, notification: discord.Embed, torrent: dict) -> discord.Embed:
+def _apply_fields(webhook_json: dict, notification: discord.Embed, torrent: Torrent) -> discord.Embed:
     """
     Applies the 'show_' fields to a notification.
     :param webhook_json: A dictionary of a webhook entry.
     :param notification: A discord.Embed object.
-    :param torrent: A dictionary of a torrent entry.
+    :param torrent: A `Torrent` object.
     :return: A discord.Embed object with the applied fields.
     """
 
@@ -24,44 +26,44 @@ def _apply_fields(webhook_json: dict, notification: discord.Embed, torrent: dict
 
     for i in range(1, 7):
         if webhook_config.get('show_published', 1) == i:
-            notification.add_field(name="Published", value=re.sub(r":\d\d -0000", "", torrent.get('published')))
+            notification.add_field(name="Published", value=re.sub(r":\d\d -0000", "", torrent.published))
 
         elif webhook_config.get('show_size', 2) == i:
-            notification.add_field(name="Size", value=torrent.get('nyaa_size'))
+            notification.add_field(name="Size", value=torrent.nyaa_size)
 
         elif webhook_config.get('show_category', 3) == i:
-            notification.add_field(name="Category", value=torrent.get('nyaa_category'))
+            notification.add_field(name="Category", value=torrent.nyaa_category)
 
         elif webhook_config.get('show_downloads', 4) == i:
-            notification.add_field(name="Downloads", value=torrent.get('nyaa_downloads'))
+            notification.add_field(name="Downloads", value=torrent.nyaa_downloads)
 
         elif webhook_config.get('show_seeders', 5) == i:
-            notification.add_field(name="Seeders", value=torrent.get('nyaa_seeders'))
+            notification.add_field(name="Seeders", value=torrent.nyaa_seeders)
 
         elif webhook_config.get('show_leechers', 6) == i:
-            notification.add_field(name="Leechers", value=torrent.get('nyaa_leechers'))
+            notification.add_field(name="Leechers", value=torrent.nyaa_leechers)
     return notification
 
 
-def _insert_tags(string: str, webhook_name: str, torrent: dict) -> str:
+def _insert_tags(string: str, webhook_name: str, torrent: Torrent) -> str:
     """
     Replaces tags in a string with values torrent and subscription information.
     :param string: The string to replace tags in.
     :param webhook_name: The name of a webhook.
-    :param torrent: A dictionary of a torrent entry.
+    :param torrent: A `Torrent` object.
     :return: A string with replaced tags.
     """
 
     string = string.replace("$webhook", webhook_name) \
-        .replace("$title", torrent.get('title')) \
-        .replace("$downloads", torrent.get('nyaa_downloads')) \
-        .replace("$seeders", torrent.get('nyaa_seeders')) \
-        .replace("$leechers", torrent.get('nyaa_leechers')) \
-        .replace("$size", torrent.get('nyaa_size')) \
-        .replace("$published", re.sub(r":\d\d -0000", "", torrent.get('published'))) \
-        .replace("$category", torrent.get('nyaa_downloads')) \
-        .replace("$uploader", torrent.get('uploader')) \
-        .replace("$watchlist", torrent.get('watchlist'))
+        .replace("$title", torrent.title) \
+        .replace("$downloads", torrent.nyaa_downloads) \
+        .replace("$seeders", torrent.nyaa_seeders) \
+        .replace("$leechers", torrent.nyaa_leechers) \
+        .replace("$size", torrent.nyaa_size) \
+        .replace("$published", re.sub(r":\d\d -0000", "", torrent.published)) \
+        .replace("$category", torrent.nyaa_downloads) \
+        .replace("$uploader", torrent.uploader) \
+        .replace("$watchlist", torrent.watchlist)
     return string
 
 
@@ -89,7 +91,7 @@ def create_webhook(url: str) -> discord.SyncWebhook | None:
     discord_webhook = None
     try:
         (webhook_id, token) = _parse_url(url)
-        discord_webhook = discord.SyncWebhook.partial(webhook_id, token)
+        discord_webhook = discord.SyncWebhook.partial(webhook_id, token, session=Requester.get_session(url))
     except Exception as e:
         Logger.debug(f"{e}", {"exc_info": True})
     return discord_webhook
@@ -117,7 +119,7 @@ class Webhooker:
 
                 try:
                     webhook_id, token = _parse_url(webhook['url'])
-                    discord_webhook = discord.SyncWebhook.partial(webhook_id, token)
+                    discord_webhook = discord.SyncWebhook.partial(webhook_id, token, session=Requester.get_session(webhook['url']))
                     self.discord_webhooks[webhook['name']] = discord_webhook
 
                     Logger.log(f" - Connected to '{webhook['name']}' webhook.")
@@ -146,11 +148,11 @@ class Webhooker:
 
         return self.discord_webhooks.get(name, None)
 
-    def send_notification(self, webhook_name: str, torrent: dict, webhook: dict = None, url: str = None) -> None:
+    def send_notification(self, webhook_name: str, torrent: Torrent, webhook: dict = None, url: str = None) -> None:
         """
         Sends a notification to a Discord webhook.
         :param webhook_name: The name of the webhook.
-        :param torrent: A dictionary of a torrent entry.
+        :param torrent: A `Torrent` object.
         :param webhook: A webhook entry dictionary. Used to test (Defaults to `None`).
         :param url: A Discord webhook URL. Used to test (Defaults to `None`).
         :return: None
@@ -171,7 +173,7 @@ class Webhooker:
         webhook_config: dict = webhook_json.get('notifications')
 
         # Notification title
-        title: str = f"Downloading New Torrent: {torrent.get('title')}"
+        title: str = f"Downloading New Torrent: {torrent.title}"
         if webhook_config and webhook_config.get('title'):
             title = _insert_tags(webhook_config.get('title'), webhook_json.get('name'), torrent)
         notification.title = title
@@ -181,7 +183,7 @@ class Webhooker:
             notification.description = _insert_tags(webhook_config.get('description'), webhook_json.get('name'), torrent)
 
         # Notification hyperlink to Nyaa page
-        notification.url = f"{torrent.get('id')}"
+        notification.url = f"{torrent.id}"
 
         # Notification 'show_' details
         notification = _apply_fields(webhook_json, notification, torrent)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The watcher modules import each other by name from `src`, as they do in the container
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,80 @@
+import pytest
+import breaker
+from breaker import Breaker
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breaker.time, "time", lambda: now[0])
+    monkeypatch.setattr(Breaker, "circuits", {})
+    monkeypatch.setattr(Breaker, "scope", "")
+    monkeypatch.delenv("BREAKER_THRESHOLD", raising=False)
+    monkeypatch.delenv("BREAKER_BACKOFF_SEC", raising=False)
+    monkeypatch.delenv("BREAKER_MAX_BACKOFF_SEC", raising=False)
+    return now
+
+
+def test_backoff_doubles_up_to_the_maximum(now):
+    assert [Breaker.get_backoff(opened) for opened in (1, 2, 3)] == [300, 600, 1200]
+    assert Breaker.get_backoff(20) == 21600
+
+
+def test_circuit_opens_at_the_threshold(now):
+    for _ in range(2):
+        Breaker.failed("Name")
+        assert Breaker.allow("Name")
+
+    Breaker.failed("Name")
+    assert not Breaker.allow("Name")
+    assert Breaker.allow("Other")
+
+
+def test_probe_after_the_backoff(now):
+    for _ in range(3):
+        Breaker.failed("Name")
+
+    now[0] += 301
+    assert Breaker.allow("Name")
+
+    Breaker.failed("Name")  # A failed probe opens the circuit for twice as long
+    now[0] += 301
+    assert not Breaker.allow("Name")
+    now[0] += 300
+    assert Breaker.allow("Name")
+
+    Breaker.succeeded("Name")
+    assert Breaker.circuits == {}
+    Breaker.failed("Name")
+    assert Breaker.allow("Name")
+
+
+def test_success_resets_the_failure_count(now):
+    for _ in range(2):
+        Breaker.failed("Name")
+    Breaker.succeeded("Name")
+    for _ in range(2):
+        Breaker.failed("Name")
+    assert Breaker.allow("Name")
+
+
+def test_zero_threshold_disables_the_breaker(now, monkeypatch):
+    monkeypatch.setenv("BREAKER_THRESHOLD", "0")
+    for _ in range(10):
+        Breaker.failed("Name")
+    assert Breaker.allow("Name")
+    assert Breaker.circuits == {}
+
+
+def test_circuits_are_scoped_to_tenants(now, monkeypatch):
+    monkeypatch.setattr(Breaker, "scope", "first")
+    for _ in range(3):
+        Breaker.failed("Name")
+    assert not Breaker.allow("Name")
+
+    monkeypatch.setattr(Breaker, "scope", "second")
+    assert Breaker.allow("Name")
+    Breaker.succeeded("Name")
+
+    monkeypatch.setattr(Breaker, "scope", "first")
+    assert not Breaker.allow("Name")
@@ -0,0 +1,109 @@
+import pytest
+import limiter
+from limiter import Limiter, _parse_retry_after
+
+URL = "https://nyaa.si/?page=rss&u=Name"
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(limiter.time, "sleep", clock.sleep)
+    monkeypatch.setattr(Limiter, "buckets", {})
+    monkeypatch.setenv("RATE_LIMIT", "2")
+    monkeypatch.setenv("RATE_LIMIT_BURST", "3")
+    return clock
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30", 30.0),
+    ("-5", 0.0),
+    (None, None),
+    ("", None),
+    ("soon", None)
+])
+def test_parse_retry_after(value, expected):
+    assert _parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_hosts_have_separate_buckets(clock):
+    assert Limiter.get_host("https://NYAA.si/view/1") == "nyaa.si"
+    for _ in range(3):
+        Limiter.acquire(URL)
+    Limiter.acquire("https://sukebei.nyaa.si/?page=rss")
+    assert clock.slept == []
+    assert set(Limiter.buckets) == {"nyaa.si", "sukebei.nyaa.si"}
+
+
+def test_acquire_waits_after_the_burst(clock):
+    for _ in range(3):
+        assert Limiter.acquire(URL)
+    assert clock.slept == []
+
+    assert Limiter.acquire(URL)
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_acquire_max_wait(clock):
+    for _ in range(3):
+        Limiter.acquire(URL)
+    tokens = Limiter.buckets["nyaa.si"].tokens
+
+    assert not Limiter.acquire(URL, max_wait=0.1)
+    assert Limiter.buckets["nyaa.si"].tokens == tokens  # No token is reserved when the request is not allowed
+    assert clock.slept == []
+
+
+def test_zero_rate_disables_the_limit(clock, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT", "0")
+    for _ in range(10):
+        assert Limiter.acquire(URL)
+    assert clock.slept == []
+
+
+def test_throttled_backs_off_and_recovers(clock):
+    Limiter.acquire(URL)
+    Limiter.check_response(URL, 429, {"retry-after": "10"})
+    bucket = Limiter.buckets["nyaa.si"]
+    assert bucket.rate == 1.0
+    assert bucket.blocked_until == clock.now + 10
+
+    Limiter.acquire(URL)
+    assert clock.slept == [pytest.approx(10)]
+
+    for _ in range(3):
+        Limiter.check_response(URL, 503)
+    assert bucket.rate == 0.25  # Never below an eighth of the configured rate
+
+    Limiter.check_response(URL, 404)
+    assert bucket.rate == 0.25
+    for _ in range(10):
+        Limiter.check_response(URL, 200)
+    assert bucket.rate == 2.0
+    assert bucket.strikes == 0
+
+
+def test_throttled_without_retry_after_doubles_the_pause(clock):
+    Limiter.throttled(URL, 429)
+    assert Limiter.buckets["nyaa.si"].blocked_until == clock.now + 2
+    Limiter.throttled(URL, 429)
+    assert Limiter.buckets["nyaa.si"].blocked_until == clock.now + 4
@@ -0,0 +1,56 @@
+import re
+import pytest
+from linter import lint_pattern, profile_rules
+
+
+@pytest.mark.parametrize("pattern", [
+    r"S\d+.*1080p",
+    r"\d+.*",
+    r"[A-Z]+\w+",
+    r"Frieren - (0[5-9]|1\d)",
+    r"(?:\[.*?\])?\s*Frieren.*(1080p|720p)",
+    r"E(0[5-9]|[1-9][0-9])",
+    r"\s+-\s+\d+",
+    r"(\s|\d)+"
+])
+def test_common_patterns_are_clean(pattern):
+    assert lint_pattern(pattern) == []
+
+
+@pytest.mark.parametrize("pattern, warning", [
+    (r"(\w+\s?)*$", "nested quantifiers"),
+    (r"(a+)+b", "nested quantifiers"),
+    (r".*.*=", "adjacent quantifiers"),
+    (r"\d+\d*x", "adjacent quantifiers"),
+    (r"(a|ab)*c", "overlapping branches"),
+    (r"(\d\w|1x)*y", "overlapping branches")
+])
+def test_ambiguous_patterns_are_flagged(pattern, warning):
+    warnings = lint_pattern(pattern)
+    assert len(warnings) == 1
+    assert warning in warnings[0]
+
+
+def test_atomic_and_possessive_repeats_are_clean():
+    if not hasattr(re, "NOFLAG"):  # Python 3.10 has no atomic groups
+        pytest.skip("Atomic groups need Python 3.11")
+    assert lint_pattern(r"(?>\w+\s?)*$") == []
+    assert lint_pattern(r"(\w+\s?)*+$") == []
+
+
+def test_invalid_pattern_raises():
+    with pytest.raises(re.error):
+        lint_pattern(r"(unclosed")
+
+
+def test_profile_rules_times_out_flagged_rules():
+    subscriptions = [{"username": "user", "watchlist": [
+        {"name": "slow", "regex": [r"(\w+\s?)*$"]},
+        {"name": "fast", "tags": ["frieren"]}
+    ]}]
+    titles = ["a" * 40 + "!", "[SubsPlease] Sousou no Frieren - 12 (1080p)"]
+
+    report = profile_rules(subscriptions, titles, timeout=1.0)
+    assert [rule.get('watchlist') for rule in report] == ["slow", "fast"]
+    assert report[0].get('timed_out') and report[0].get('hits') == 0
+    assert not report[1].get('timed_out') and report[1].get('hits') == 1
@@ -0,0 +1,70 @@
+import os
+import pytest
+from matcher import Matcher, Rule, get_required_literal
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils", "data", "titles.txt")
+
+
+def load_titles() -> list[str]:
+    file = open(CORPUS, "r", encoding="utf-8")
+    titles = [line.strip() for line in file.read().split("\n") if line.strip()]
+    file.close()
+    return titles
+
+
+@pytest.mark.parametrize("pattern, literal", [
+    (r"Frieren - (0[5-9]|1\d)", "frieren - "),
+    (r"S0[1-3]E(0[5-9]|1[0-9])\b", None),
+    (r"(Dungeon Meshi|Delicious in Dungeon) - \d+", " - "),
+    (r"(?:\[Erai-raws\] )?One Piece", "one piece"),
+    (r"(?:Batch)?Kusuriya", "kusuriya"),
+    (r"(?i)frieren", None),
+    (r"(?i:Frieren) - 12", None),
+    (r"ab", None)
+])
+def test_get_required_literal(pattern, literal):
+    assert get_required_literal(pattern) == literal
+
+
+@pytest.mark.parametrize("entry, title, match", [
+    ({"tags": ["frieren"]}, "[SubsPlease] Sousou no Frieren - 12 (1080p)", True),
+    ({"tags": ["frieren"], "exclude_regex": ["720p"]}, "[SubsPlease] Sousou no Frieren - 12 (720p)", False),
+    ({"regex": [r"Frieren - (0[5-9]|1\d)"]}, "[SubsPlease] Sousou no Frieren - 04 (1080p)", False),
+    ({"tags": ["frieren"], "regex": [r" - 1\d"]}, "[SubsPlease] Sousou no Frieren - 12 (1080p)", True),
+    ({"tags": ["frieren"], "regex": [r" - 1\d"]}, "[SubsPlease] Dungeon Meshi - 12 (1080p)", False),
+    ({}, "[SubsPlease] Dungeon Meshi - 12 (1080p)", True)
+])
+def test_rule_evaluate(entry, title, match):
+    assert Rule(entry).evaluate(title).get('match') is match
+
+
+def test_indexed_candidates_match_a_full_scan(monkeypatch):
+    monkeypatch.setenv("MATCHER_INDEX_MIN_RULES", "0")
+    watchlist = [
+        {"tags": ["frieren"]},
+        {"tags": ["Dungeon Meshi", "Delicious in Dungeon"]},
+        {"regex": [r"One Piece - 1\d{3}"]},
+        {"regex": [r"S0[1-3]E(0[5-9]|1[0-9])\b"]},
+        {"regex": [r"(?i)kusuriya"]},
+        {"tags": ["ab"]},
+        {"tags": ["1080p"], "regex": [r"Oshi no Ko"], "exclude_regex": [r"HEVC"]}
+    ]
+    matcher = Matcher(watchlist)
+    assert matcher.indexed
+
+    for title in load_titles():
+        lower_title = title.lower()
+        candidates = matcher.candidates(lower_title)
+        expected = [rule for rule in matcher.rules if rule.evaluate(title, lower_title).get('match')]
+        assert [rule for rule in candidates if rule.evaluate(title, lower_title).get('match')] == expected, title
+
+
+def test_small_watchlists_are_not_indexed(monkeypatch):
+    monkeypatch.setenv("MATCHER_INDEX_MIN_RULES", "3")
+    small = Matcher([{"tags": ["frieren"]}, {"tags": ["meshi"]}])
+    assert not small.indexed and small.index == {}
+    assert small.candidates("[subsplease] one piece - 1100") == small.rules
+
+    large = Matcher([{"tags": ["frieren"]}, {"tags": ["meshi"]}, {"tags": ["piece"]}])
+    assert large.indexed
+    assert [rule.tags for rule in large.candidates("[subsplease] one piece - 1100")] == [["piece"]]
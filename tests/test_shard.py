@@ -0,0 +1,109 @@
+import json
+import os
+import time
+import pytest
+from shard import Shard
+
+SUBSCRIPTIONS = [{"username": f"user{i}", "rss": None} for i in range(200)]
+
+
+@pytest.fixture
+def lease_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WATCHER_DIR", str(tmp_path))
+    monkeypatch.delenv("ENV", raising=False)
+    monkeypatch.delenv("SHARD_LEASE_SEC", raising=False)
+    monkeypatch.setattr(Shard, "worker_id", "")
+    monkeypatch.setattr(Shard, "workers", [])
+    monkeypatch.setattr(Shard, "ring", [])
+    os.makedirs(Shard.get_lease_dir())
+    return Shard.get_lease_dir()
+
+
+def write_lease(lease_dir: str, worker_id: str, expires: float) -> None:
+    file = open(os.path.join(lease_dir, f"{worker_id}.json"), "w")
+    file.write(json.dumps({"worker_id": worker_id, "expires": expires}))
+    file.close()
+
+
+def get_owned(worker_id: str, workers: list[str]) -> set[str]:
+    Shard.worker_id = worker_id
+    Shard.workers = workers
+    Shard.ring = []
+    Shard.refresh()
+    return {sub['username'] for sub in SUBSCRIPTIONS if Shard.owns(sub)}
+
+
+@pytest.mark.parametrize("workers, sharding, expected", [
+    ("1", None, False),
+    ("3", None, True),
+    ("3", "false", False),
+    ("1", "true", True)
+])
+def test_is_enabled(monkeypatch, workers, sharding, expected):
+    monkeypatch.setenv("WORKERS", workers)
+    if sharding is None:
+        monkeypatch.delenv("SHARDING", raising=False)
+    else:
+        monkeypatch.setenv("SHARDING", sharding)
+    assert Shard.is_enabled() == expected
+
+
+def test_lease_seconds_minimum(monkeypatch):
+    monkeypatch.setenv("SHARD_LEASE_SEC", "1")
+    assert Shard.get_lease_seconds() == 10
+
+
+def test_owns_everything_without_a_ring(lease_dir):
+    assert all(Shard.owns(sub) for sub in SUBSCRIPTIONS)
+
+
+def test_renew_and_stop(lease_dir):
+    Shard.worker_id = "a"
+    Shard.renew()
+    file = open(os.path.join(lease_dir, "a.json"), "r")
+    lease = json.loads(file.read())
+    file.close()
+    assert lease['worker_id'] == "a"
+    assert lease['expires'] > time.time()
+
+    Shard.stop()
+    assert os.listdir(lease_dir) == []
+
+
+def test_workers_partition_subscriptions(lease_dir):
+    workers = ["a", "b", "c"]
+    for worker in workers:
+        write_lease(lease_dir, worker, time.time() + 60)
+
+    owned = [get_owned(worker, []) for worker in workers]
+    assert Shard.workers == workers
+    assert set().union(*owned) == {sub['username'] for sub in SUBSCRIPTIONS}
+    assert sum(len(subs) for subs in owned) == len(SUBSCRIPTIONS)
+    assert all(subs for subs in owned)
+
+
+def test_expired_lease_is_rebalanced(lease_dir):
+    for worker in ("a", "b"):
+        write_lease(lease_dir, worker, time.time() + 60)
+    write_lease(lease_dir, "c", time.time() - 1)
+
+    before = get_owned("a", [])
+    assert Shard.workers == ["a", "b"]
+    assert not os.path.exists(os.path.join(lease_dir, "c.json"))
+
+    write_lease(lease_dir, "b", time.time() - 1)
+    assert Shard.refresh()
+    after = {sub['username'] for sub in SUBSCRIPTIONS if Shard.owns(sub)}
+    assert Shard.workers == ["a"]
+    assert before < after == {sub['username'] for sub in SUBSCRIPTIONS}
+    assert not Shard.refresh()
+
+
+def test_refresh_keeps_most_assignments(lease_dir):
+    for worker in ("a", "b", "c"):
+        write_lease(lease_dir, worker, time.time() + 60)
+    before = get_owned("a", [])
+
+    write_lease(lease_dir, "d", time.time() + 60)
+    after = get_owned("a", [])
+    assert after <= before  # Adding a worker only moves subscriptions to the new worker
@@ -0,0 +1,100 @@
+import time
+import pytest
+from titles import get_episode_key, parse_title
+from torrent import Torrent
+from watcher import Watcher
+
+
+@pytest.mark.parametrize("title, series, season, episode, version, resolution", [
+    ("[SubsPlease] Sousou no Frieren - 12 (1080p) [ABCD1234].mkv", "sousou no frieren", 1, 12, 1, "1080p"),
+    ("[Erai-raws] Sousou no Frieren - 12v2 [720p][Multiple Subtitle]", "sousou no frieren", 1, 12, 2, "720p"),
+    ("Sousou.no.Frieren.S01E12.1080p.WEB.H264-GROUP", "sousou no frieren", 1, 12, 1, "1080p"),
+    ("[ASW] Kusuriya no Hitorigoto S2 - 05 [1080p HEVC]", "kusuriya no hitorigoto", 2, 5, 1, "1080p"),
+    ("[Group] Oshi no Ko 2nd Season - 03 (1920x1080)", "oshi no ko", 2, 3, 1, "1080p"),
+    ("[Group] One Piece - 1100 v3 (480p)", "one piece", 1, 1100, 3, "480p")
+])
+def test_parse_title(title, series, season, episode, version, resolution):
+    assert parse_title(title) == {"series": series, "season": season, "episode": episode, "version": version, "resolution": resolution}
+
+
+@pytest.mark.parametrize("title", [
+    "[SubsPlease] Sousou no Frieren (01-28) (1080p) [Batch]",
+    "Frieren Artbook (1080p)",
+    "[Group] - 12 (1080p)"
+])
+def test_parse_title_without_an_episode(title):
+    assert parse_title(title) is None
+
+
+def test_episode_key_matches_across_formats():
+    keys = {get_episode_key(parse_title(title)) for title in [
+        "[SubsPlease] Sousou no Frieren - 12 (1080p)",
+        "[Erai-raws] Sousou no Frieren - 12v2 [720p]",
+        "Sousou.no.Frieren.S01E12.1080p.WEB"
+    ]}
+    assert keys == {("sousou no frieren", 1, 12)}
+
+
+def create_torrent(title: str, age_min: float = 0) -> Torrent:
+    return Torrent(title, nyaa_infohash=title, published_time=time.time() - age_min * 60)
+
+
+def create_watcher(downloaded: list[str] = None) -> Watcher:
+    history = {"downloads": [{"torrent_title": title, "nyaa_hash": title} for title in downloaded or []], "errors": []}
+    return Watcher({"subscriptions": []}, history)
+
+
+def test_first_policy_skips_downloaded_and_queued_episodes():
+    watcher = create_watcher(["[SubsPlease] Sousou no Frieren - 11 (1080p)"])
+    policy = {"policy": "first"}
+
+    assert watcher.check_episode(create_torrent("[Erai-raws] Sousou no Frieren - 11 [720p]"), policy) == "skip"
+    assert watcher.check_episode(create_torrent("[Erai-raws] Sousou no Frieren - 12 [720p]"), policy) == "download"
+
+    watcher.queue_episode("[Erai-raws] Sousou no Frieren - 12 [720p]")
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)"), policy) == "skip"
+
+
+def test_failed_downloads_are_not_recorded():
+    watcher = create_watcher()
+    first = create_torrent("[Erai-raws] Sousou no Frieren - 12 [720p]")
+    watcher.queue_episode(first.title)
+    watcher.finish_episodes([])
+
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)"), {"policy": "first"}) == "download"
+    watcher.finish_episodes([first])
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)"), {"policy": "first"}) == "skip"
+
+
+def test_version_policy_keeps_higher_versions():
+    watcher = create_watcher(["[SubsPlease] Sousou no Frieren - 12 (1080p)"])
+    policy = {"policy": "version"}
+
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)"), policy) == "skip"
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12v2 (1080p)"), policy) == "download"
+
+
+def test_resolution_policy_waits_for_the_preferred_resolution():
+    watcher = create_watcher()
+    policy = {"policy": "resolution", "resolution": "1080p", "window_min": 60}
+
+    assert watcher.check_episode(create_torrent("[Erai-raws] Sousou no Frieren - 12 [720p]", 5), policy) == "defer"
+    assert watcher.check_episode(create_torrent("[Erai-raws] Sousou no Frieren - 12 [720p]", 90), policy) == "download"
+    assert watcher.check_episode(create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)"), policy) == "download"
+
+    watcher.finish_episodes([create_torrent("[SubsPlease] Sousou no Frieren - 12 (1080p)")])
+    assert watcher.check_episode(create_torrent("[Other] Sousou no Frieren - 12 (1080p)"), policy) == "skip"
+
+
+def test_waiting_torrents_are_restored():
+    torrent = create_torrent("[Erai-raws] Sousou no Frieren - 12 [720p]", 5)
+    torrent.uploader = "Erai-raws"
+    torrent.webhooks = {"discord"}
+    watcher = Watcher({"subscriptions": [{"username": "Erai-raws"}]}, {"downloads": [], "errors": []})
+    watcher.pending = [(torrent, {"policy": "resolution"})]
+    watcher.deferred = [torrent]
+
+    subscription = {"username": "Erai-raws"} | watcher.get_waiting().get("Erai-raws")
+    restored = Watcher({"subscriptions": [subscription]}, {"downloads": [], "errors": []})
+    assert [(torrent.title, policy) for torrent, policy in restored.pending] == [(torrent.title, {"policy": "resolution"})]
+    assert restored.deferred[0].to_dict() == torrent.to_dict()
@@ -0,0 +1,84 @@
+import json
+import os
+import pytest
+from updates import get_json_path, update_files
+
+
+@pytest.fixture
+def watcher_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WATCHER_DIR", str(tmp_path))
+    monkeypatch.delenv("ENV", raising=False)
+    return tmp_path
+
+
+def write_json(filename: str, data: dict) -> None:
+    file = open(get_json_path(filename), "w")
+    file.write(json.dumps(data))
+    file.close()
+
+
+def read_json(filename: str) -> dict:
+    file = open(get_json_path(filename), "r")
+    data = json.loads(file.read())
+    file.close()
+    return data
+
+
+def test_json_path(monkeypatch):
+    monkeypatch.setenv("WATCHER_DIR", "/data")
+    monkeypatch.setenv("ENV", "development")
+    assert get_json_path("config") == "/data/json/dev.config.json"
+    monkeypatch.setenv("ENV", "production")
+    assert get_json_path("config") == "/data/config.json"
+
+
+def test_update_from_v101(watcher_dir):
+    write_json("config", {"nyaa_rss": "https://nyaa.si/?page=rss&u=Name", "watcher_interval_seconds": 300, "version": "1.0.1"})
+    write_json("watchlist", {"watchlist": [{"name": "Frieren", "tags": [], "regex": ["Frieren - \\d+"], "exclude_regex": []}]})
+    write_json("history", {"history": [{"torrent_title": "Frieren - 01", "date_downloaded": "2023-10-01", "nyaa_page": "https://nyaa.si/view/1", "nyaa_hash": "abc"}]})
+    write_json("webhooks", {"webhooks": []})
+
+    assert update_files("1.0.1") == "1.2.1"
+    assert read_json("config") == {"version": "1.2.1"}
+
+    subscriptions = read_json("subscriptions")
+    assert subscriptions['interval_sec'] == 300
+    assert [sub['username'] for sub in subscriptions['subscriptions']] == ["Name"]
+    assert subscriptions['subscriptions'][0]['watchlist'] == [{"name": "Frieren", "tags": [], "regex": ["Frieren - \\d+"], "exclude_regex": [], "webhooks": []}]
+
+    history = read_json("history")
+    assert history['errors'] == []
+    assert [(entry['uploader'], entry['torrent_title']) for entry in history['downloads']] == [("Name", "Frieren - 01")]
+    assert read_json("webhooks")['webhooks'][0]['name'] == "Example Webhook Name"
+    assert not [filename for filename in os.listdir(watcher_dir) if filename.endswith(".tmp")]
+
+
+def test_update_writes_only_changed_files(watcher_dir):
+    write_json("config", {"version": "1.2.0"})
+    write_json("subscriptions", {"interval_sec": 600, "subscriptions": []})
+    os.utime(get_json_path("subscriptions"), (0, 0))
+
+    assert update_files("1.2.0") == "1.2.1"
+    assert read_json("config") == {"version": "1.2.1"}
+    assert os.path.getmtime(get_json_path("subscriptions")) == 0
+    assert not os.path.exists(get_json_path("webhooks"))
+
+
+@pytest.mark.parametrize("version", ["1.2.1", "9.9.9"])
+def test_current_versions_are_not_updated(watcher_dir, version):
+    write_json("config", {"version": version})
+    os.utime(get_json_path("config"), (0, 0))
+
+    assert update_files(version) == version
+    assert os.path.getmtime(get_json_path("config")) == 0
+
+
+def test_invalid_json_names_the_file(watcher_dir):
+    write_json("config", {"version": "1.2.0"})
+    file = open(get_json_path("history"), "w")
+    file.write("{")
+    file.close()
+
+    with pytest.raises(json.decoder.JSONDecodeError, match="history.json"):
+        update_files("1.2.0")
+    assert read_json("config") == {"version": "1.2.0"}
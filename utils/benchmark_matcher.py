@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from matcher import Matcher  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "titles.txt")
+KINDS = ("tags", "regex", "exclude", "mixed")
+EXCLUDES = [r"\b(480|720)p\b", r"(?i)batch|\(\d\d-\d\d\)", r"HEVC|x265|H\.265", r"\d\dv2\b", r"\[(RUS|ARA)\]"]
+
+
+def load_titles(path: str) -> list[str]:
+    file = open(path, "r", encoding="utf-8")
+    titles = [line.strip() for line in file.read().split("\n") if line.strip()]
+    file.close()
+    return titles
+
+
+def get_series_names(titles: list[str]) -> list[str]:
+    # Release group titles ("[Group] Series - 01") and scene titles ("Series.S01E01") keep the series name in its original case
+    names = set()
+    for title in titles:
+        match = re.match(r"\[[^\]]+\] (.+?) (?:- \d|S\d\d|\(\d)", title) or re.match(r"([\w.-]+?)\.S\d\dE\d\d", title)
+        if match and "|" not in match.group(1):
+            names.add(match.group(1).replace(".", " ") if " " not in match.group(1) else match.group(1))
+    return sorted(names)
+
+
+def create_entry(kind: str, name: str, position: int) -> dict:
+    if kind == "mixed":
+        kind = KINDS[position % 3]
+    if kind == "tags":
+        return {"name": name, "tags": [name]}
+    if kind == "regex":
+        # Every fourth pattern has no required literal, so it cannot be indexed and is evaluated for every title
+        if position % 4 == 3:
+            return {"name": name, "regex": [r"S0[1-3]E(0[5-9]|1[0-9])\b"]}
+        return {"name": name, "regex": [rf"{re.escape(name)} - (0[5-9]|[12][0-9])\b"]}
+    return {"name": name, "tags": [name], "exclude_regex": EXCLUDES}
+
+
+def create_watchlist(kind: str, size: int, names: list[str]) -> list[dict]:
+    # Large watchlists repeat the series names with a suffix, like subscriptions to series that are not in the feed
+    watchlist = []
+    for position in range(size):
+        name = names[position % len(names)]
+        if position >= len(names):
+            name += f" {position // len(names) + 1}"
+        watchlist.append(create_entry(kind, name, position))
+    return watchlist
+
+
+def time_matcher(matcher: Matcher, titles: list[str], indexed: bool) -> tuple[float, int, int]:
+    candidates = matches = 0
+    start = time.perf_counter()
+    for title in titles:
+        lower_title = title.lower()
+        rules = matcher.candidates(lower_title) if indexed else matcher.rules
+        candidates += len(rules)
+        for rule in rules:
+            if rule.evaluate(title, lower_title).get('match'):
+                matches += 1
+    return time.perf_counter() - start, candidates, matches
+
+
+def time_rules(matcher: Matcher, titles: list[str]) -> list[float]:
+    lower_titles = [title.lower() for title in titles]
+    costs = []
+    for rule in matcher.rules:
+        start = time.perf_counter()
+        for title, lower_title in zip(titles, lower_titles):
+            rule.evaluate(title, lower_title)
+        costs.append((time.perf_counter() - start) / len(titles))
+    return costs
+
+
+def run_scenario(kind: str, size: int, names: list[str], titles: list[str], repeat: int) -> dict:
+    watchlist = create_watchlist(kind, size, names)
+    matcher = Matcher(watchlist)
+
+    indexed = min(time_matcher(matcher, titles, True) for _ in range(repeat))
+    scan = min(time_matcher(matcher, titles, False) for _ in range(repeat))
+    costs = time_rules(matcher, titles)
+    slowest = max(range(len(costs)), key=lambda position: costs[position])
+
+    return {
+        "scenario": f"{kind}-{size}",
+        "kind": kind,
+        "rules": size,
+        "unindexed_rules": len(matcher.unindexed),
+        "titles": len(titles),
+        "indexed_titles_per_sec": len(titles) / indexed[0],
+        "scan_titles_per_sec": len(titles) / scan[0],
+        "candidates_per_title": indexed[1] / len(titles),
+        "matches": indexed[2],
+        "rule_cost_ns": sum(costs) / len(costs) * 1e9,
+        "slowest_rule": watchlist[slowest].get('name'),
+        "slowest_rule_ns": costs[slowest] * 1e9
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the watchlist matcher against a corpus of Nyaa torrent titles with generated watchlists.")
+    parser.add_argument("--titles", default=CORPUS, help="Path to a text file with one torrent title per line (Defaults to 'utils/data/titles.txt').")
+    parser.add_argument("--sizes", default="10,300", help="Comma-separated numbers of watchlist entries (Defaults to '10,300').")
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"Comma-separated watchlist kinds: {', '.join(KINDS)} (Defaults to all).")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each scenario. The fastest run is reported (Defaults to 5).")
+    parser.add_argument("--json", help="Path to write the results to as JSON.")
+    parser.add_argument("--compare", help="Path to the JSON results of a previous run to compare against.")
+    args = parser.parse_args()
+
+    titles = load_titles(args.titles)
+    names = get_series_names(titles)
+    if not titles or not names:
+        print("(Error: No torrent titles with series names to benchmark)")
+        sys.exit(1)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip() in KINDS]
+    print(f"~~~ Matcher Benchmark ({len(titles)} titles, {len(names)} series, best of {args.repeat} runs) ~~~")
+
+    baseline = {}
+    if args.compare:
+        file = open(args.compare, "r")
+        baseline = {result.get('scenario'): result for result in json.loads(file.read()).get('results', [])}
+        file.close()
+
+    results = []
+    print(f"{'Scenario':<14} {'Rules':>5} {'Titles/s':>10} {'Scan/s':>10} {'Cand/title':>10} {'Matches':>7} {'Rule (ns)':>9} {'Change':>7}  Slowest Rule")
+    for kind in kinds:
+        for size in sizes:
+            result = run_scenario(kind, size, names, titles, max(1, args.repeat))
+            results.append(result)
+
+            previous = baseline.get(result.get('scenario'))
+            change = f"{result['indexed_titles_per_sec'] / previous['indexed_titles_per_sec'] - 1:+.0%}" if previous else ""
+            print(f"{result['scenario']:<14} {result['rules']:>5} {result['indexed_titles_per_sec']:>10,.0f} {result['scan_titles_per_sec']:>10,.0f} "
+                  f"{result['candidates_per_title']:>10.1f} {result['matches']:>7} {result['rule_cost_ns']:>9,.0f} {change:>7}  "
+                  f"{result['slowest_rule'][:28]} ({result['slowest_rule_ns']:,.0f} ns)")
+
+    if args.json:
+        file = open(args.json, "w")
+        file.write(json.dumps({
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": os.path.basename(args.titles),
+            "repeat": args.repeat,
+            "results": results
+        }, indent=4))
+        file.close()
+        print(f"\nResults written to '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
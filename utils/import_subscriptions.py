@@ -0,0 +1,151 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import feedparser  # noqa: E402
+from config import Config, _lock_json, _verify_subscriptions_entry, _write_json  # noqa: E402
+from logger import Logger  # noqa: E402
+from requester import Requester  # noqa: E402
+from watcher import get_cursor  # noqa: E402
+
+
+def split_values(string: str) -> list[str]:
+    return [value.strip() for value in (string or "").split(";") if value.strip()]
+
+
+def load_csv(path: str) -> list[dict]:
+    # List values are separated with semicolons, and rows with the same 'username' add watchlist entries to one subscription
+    subscriptions: dict[str, dict] = {}
+    file = open(path, "r", encoding="utf-8", newline="")
+    for row in csv.DictReader(file):
+        username = (row.get('username') or "").strip()
+        if not username:
+            continue
+
+        sub = subscriptions.setdefault(username, {
+            'username': username,
+            'rss': (row.get('rss') or "").strip() or f"https://nyaa.si/?page=rss&u={username}",
+            'watchlist': [],
+            'webhooks': split_values(row.get('sub_webhooks')),
+            'previous_hash': ""
+        })
+
+        watchlist = {'name': (row.get('name') or "").strip()}
+        for key in ('tags', 'regex', 'exclude_regex', 'webhooks'):
+            values = split_values(row.get(key))
+            if values:
+                watchlist[key] = values
+        if len(watchlist) > 1:
+            sub['watchlist'].append(watchlist)
+    file.close()
+    return list(subscriptions.values())
+
+
+def load_json(path: str) -> list[dict]:
+    file = open(path, "r", encoding="utf-8")
+    data = json.loads(file.read())
+    file.close()
+
+    # Entries with the same 'username' are merged into one subscription, like CSV rows
+    subscriptions: dict[str, dict] = {}
+    for sub in data.get('subscriptions', []) if isinstance(data, dict) else data:
+        sub.setdefault('rss', f"https://nyaa.si/?page=rss&u={sub.get('username')}")
+        sub.setdefault('previous_hash', "")
+
+        merged = subscriptions.setdefault(sub.get('username'), sub)
+        if merged is not sub:
+            merged['watchlist'] = merged.get('watchlist', []) + sub.get('watchlist', [])
+            merged['webhooks'] = merged.get('webhooks', []) + [webhook for webhook in sub.get('webhooks', []) if webhook not in merged.get('webhooks', [])]
+    return list(subscriptions.values())
+
+
+def validate_feed(sub: dict, timeout: float) -> dict:
+    # Seeds the cursor from the current feed head, so the first check does not download every upload
+    try:
+        response = Requester.get(sub.get('rss'), timeout=(timeout, timeout))
+    except Exception as e:
+        return {"result": False, "message": f"cannot fetch {sub.get('rss')} ({e})"}
+    if response.status_code != 200:
+        return {"result": False, "message": f"{sub.get('rss')} responded with HTTP Status Code: {response.status_code}"}
+
+    feed = feedparser.parse(response.content)
+    if feed.bozo and not feed.entries:
+        return {"result": False, "message": f"{sub.get('rss')} is not an RSS feed"}
+    if feed.entries:
+        sub['previous_hash'], sub['previous_published'], sub['recent_hashes'] = get_cursor(feed.entries, [])
+    return {"result": True, "message": f"{len(feed.entries)} uploads"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imports a CSV or JSON list of subscriptions into 'subscriptions.json' without prompts.")
+    parser.add_argument("file", help="Path to a CSV or JSON file with the subscriptions to import.")
+    parser.add_argument("--watcher-dir", default=os.environ.get("WATCHER_DIR", "/watcher"), help="Directory of the 'subscriptions.json' file (Defaults to the 'WATCHER_DIR' environment variable or '/watcher').")
+    parser.add_argument("--workers", type=int, default=8, help="Number of RSS feeds validated at the same time (Defaults to 8).")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Time (in seconds) to wait for each RSS feed (Defaults to 10).")
+    parser.add_argument("--rate-limit", type=float, default=float(os.environ.get("RATE_LIMIT", 1)),
+                        help="Requests per second to each host, after the first 'RATE_LIMIT_BURST' requests (Defaults to the 'RATE_LIMIT' environment variable or 1).")
+    parser.add_argument("--replace", action="store_true", help="Replace existing subscriptions with the same 'username' (Defaults to skipping them).")
+    parser.add_argument("--no-validate", action="store_true", help="Skip fetching the RSS feeds. The 'previous_hash' values are not seeded.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the merged 'subscriptions.json' instead of writing it.")
+    args = parser.parse_args()
+
+    os.environ["WATCHER_DIR"] = args.watcher_dir
+    os.environ["RATE_LIMIT"] = str(args.rate_limit)  # Feeds on the same host are validated at this rate, whatever the number of workers
+    Logger.setup()  # Regex lint warnings of the imported watchlists are logged while verifying
+
+    imported = load_json(args.file) if args.file.lower().endswith(".json") else load_csv(args.file)
+    print(f"~~~ Nyaa Watcher: Importing {len(imported)} subscription{'' if len(imported) == 1 else 's'} ~~~")
+
+    valid = []
+    for sub in imported:
+        result = _verify_subscriptions_entry(sub)
+        if result.get('result'):
+            valid.append(sub)
+        else:
+            print(f"(Error: '{sub.get('username')}' was not imported: {result.get('message')})")
+
+    if not args.no_validate:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = {executor.submit(validate_feed, sub, args.timeout): sub for sub in valid}
+            for future in as_completed(futures):
+                sub = futures[future]
+                result = future.result()
+                if result.get('result'):
+                    print(f" - Validated '{sub.get('username')}' ({result.get('message')}).")
+                else:
+                    print(f"(Error: '{sub.get('username')}' was not imported: {result.get('message')})")
+                    valid.remove(sub)
+
+    with _lock_json("subscriptions"):
+        subscriptions = Config.get_subscriptions()
+        positions = {sub.get('username'): i for i, sub in enumerate(subscriptions.get('subscriptions', []))}
+
+        added = replaced = skipped = 0
+        for sub in valid:
+            position = positions.get(sub.get('username'))
+            if position is None:
+                positions[sub.get('username')] = len(subscriptions['subscriptions'])
+                subscriptions['subscriptions'].append(sub)
+                added += 1
+            elif args.replace:
+                subscriptions['subscriptions'][position] = sub
+                replaced += 1
+            else:
+                skipped += 1
+
+        if args.dry_run:
+            print(f"\n~~~ subscriptions.json ~~~\n{json.dumps(subscriptions, indent=4)}")
+        else:
+            _write_json("subscriptions", subscriptions)
+
+    print(f"Added {added}, replaced {replaced} and skipped {skipped} subscription{'' if added + replaced + skipped == 1 else 's'}"
+          f"{' (dry run)' if args.dry_run else ''}. {len(imported) - len(valid)} failed.")
+
+
+if __name__ == "__main__":
+    main()
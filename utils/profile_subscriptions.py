@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from linter import profile_rules  # noqa: E402
+
+
+def load_titles(path: str) -> list[str]:
+    file = open(path, "r", encoding="utf-8")
+    titles = [line.strip() for line in file.read().split("\n") if line.strip()]
+    file.close()
+    return titles
+
+
+def fetch_titles(subscriptions: list[dict]) -> list[str]:
+    import feedparser
+    from requester import Requester
+
+    titles = []
+    for sub in subscriptions:
+        print(f"Fetching titles from '{sub.get('username')}'...")
+        try:
+            response = Requester.get(sub.get('rss'))
+            feed = feedparser.parse(response.content)
+            titles += [entry.get('title') for entry in feed.entries if entry.get('title')]
+        except Exception as e:
+            print(f"(Error: Cannot fetch {sub.get('rss')}: {e})")
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiles the watchlist rules in 'subscriptions.json' against a corpus of torrent titles.")
+    parser.add_argument("subscriptions", help="Path to the 'subscriptions.json' file.")
+    parser.add_argument("--titles", help="Path to a text file with one torrent title per line (Defaults to fetching the titles from each subscription's RSS feed).")
+    parser.add_argument("--slow-ms", type=float, default=5.0, help="Time (in milliseconds) for a single title that flags a rule as slow (Defaults to 5).")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Time (in seconds) that a rule with a flagged pattern can take to evaluate every title before it is stopped (Defaults to 10).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    file = open(args.subscriptions, "r")
+    subscriptions = json.loads(file.read()).get('subscriptions', [])
+    file.close()
+
+    titles = load_titles(args.titles) if args.titles else fetch_titles(subscriptions)
+    if not titles:
+        print("(Error: No torrent titles to profile)")
+        sys.exit(1)
+
+    report = profile_rules(subscriptions, titles, args.slow_ms, args.timeout)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    print(f"\n~~~ Watchlist Rules ({len(report)} rules, {len(titles)} titles) ~~~")
+    print(f"{'Subscription':<20} {'Watchlist':<24} {'Hits':>6} {'Hit Rate':>9} {'Total (ms)':>11} {'Mean (us)':>10} {'Max (ms)':>9}")
+    for rule in report:
+        if rule.get('timed_out'):
+            print(f"{rule.get('subscription')[:20]:<20} {rule.get('watchlist')[:24]:<24} {'(timed out after ' + format(args.timeout, 'g') + ' seconds)':>49}")
+        else:
+            print(f"{rule.get('subscription')[:20]:<20} {rule.get('watchlist')[:24]:<24} {rule.get('hits'):>6} {rule.get('hit_rate'):>9.1%} "
+                  f"{rule.get('total_ms'):>11.2f} {rule.get('mean_us'):>10.2f} {rule.get('max_ms'):>9.3f}")
+        for warning in rule.get('warnings'):
+            print(f"    (Warning: {warning})")
+
+
+if __name__ == "__main__":
+    main()
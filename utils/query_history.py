@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from history import HistoryIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Searches the downloads and errors in 'history.json' with the history index.")
+    parser.add_argument("text", nargs="?", help="Words that the torrent title must contain. The last word can be the start of a word.")
+    parser.add_argument("--watcher-dir", default=os.environ.get("WATCHER_DIR", "/watcher"), help="Directory of the 'history.json' file (Defaults to the 'WATCHER_DIR' environment variable or '/watcher').")
+    parser.add_argument("--uploader", help="Name of the uploader.")
+    parser.add_argument("--since", help="Earliest date (E.g., 2024-01-31).")
+    parser.add_argument("--until", help="Latest date, inclusive (E.g., 2024-12-31).")
+    parser.add_argument("--hash", help="Nyaa infohash of the torrent.")
+    parser.add_argument("--errors", action="store_true", help="Only search the errors.")
+    parser.add_argument("--downloads", action="store_true", help="Only search the downloads.")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of results (Defaults to 50).")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from 'history.json' if it is out of date.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    os.environ["WATCHER_DIR"] = args.watcher_dir
+    if args.rebuild or not os.path.exists(HistoryIndex.get_path()):
+        from config import Config
+        HistoryIndex.sync(Config.get_history())
+
+    start = time.perf_counter()
+    kind = "error" if args.errors else "download" if args.downloads else None
+    results = HistoryIndex.search(args.text, args.uploader, args.since, args.until, args.hash, kind, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return
+
+    for result in results:
+        print(f"{(result.get('date') or '')[:19]:<19} {result.get('kind'):<8} {(result.get('uploader') or '')[:20]:<20} {result.get('torrent_title')}")
+        print(f"{'':<49}{result.get('nyaa_page') or ''} {result.get('nyaa_hash') or ''}")
+    print(f"\n{len(results)} result{'' if len(results) == 1 else 's'} in {elapsed:.1f} ms.")
+
+
+if __name__ == "__main__":
+    main()